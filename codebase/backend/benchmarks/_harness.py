@@ -0,0 +1,82 @@
+"""
+Shared setup for the benchmarks that run the API in a subprocess.
+
+Importing this module points DATABASE_URL at a throwaway SQLite file and
+ARCHIVE_ROOT at the repository archive (unless they are already set) and
+puts src/ on sys.path.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+# Use a throwaway database and the repository archive unless told otherwise
+_tmpdir = tempfile.mkdtemp(prefix="lob-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault(
+    "ARCHIVE_ROOT",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'archive'))
+)
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import requests
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def create_user() -> None:
+    """Create the tables and the benchmark user if it does not exist yet"""
+    # Imported here so a DATABASE_URL set after import (--database-url) is used
+    from database.connection import SessionLocal, engine
+    from database.models import Base, User
+    from services.auth import get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.username == USERNAME).first():
+            db.add(User(
+                username=USERNAME,
+                email="bench@librarybabylon.com",
+                hashed_password=get_password_hash(PASSWORD),
+                role="user"
+            ))
+            db.commit()
+    finally:
+        db.close()
+
+
+def start_server(port: int, env: Optional[dict] = None) -> subprocess.Popen:
+    """Start uvicorn on port with extra environment variables and wait until /ready"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=project_root,
+        env={**os.environ, **(env or {})}
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            # /ready turns 200 once the archive caches are warm
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("API server did not start")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: authenticated request throughput on the sync and async engines.
+
+Starts the API twice in a uvicorn subprocess, first with DB_ASYNC=0 (user
+lookups run a sync session on the worker thread pool) and then with
+DB_ASYNC=1 (they await the async engine on the event loop), and has
+concurrent threads call /api/auth/me with a bearer token for a fixed
+time. The auth user cache is off by default (--cache-ttl 0) so every
+request reaches the database; pass --database-url to measure against
+PostgreSQL instead of a throwaway SQLite file.
+
+Usage:
+    python benchmarks/auth_throughput.py [--threads 32] [--seconds 10] [--database-url URL]
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from _harness import PASSWORD, USERNAME, create_user, free_port, start_server
+
+import requests
+
+
+def _load(base_url: str, token: str, deadline: float, latencies: list) -> None:
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        session.get(f"{base_url}/api/auth/me").raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def _measure(label: str, env: dict, args: argparse.Namespace) -> None:
+    port = free_port()
+    server = start_server(port, env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        response = requests.post(
+            f"{base_url}/api/auth/login", data={"username": USERNAME, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        # Warm up connections and the pool
+        warmup = []
+        _load(base_url, token, time.perf_counter() + 1, warmup)
+
+        per_thread = [[] for _ in range(args.threads)]
+        deadline = time.perf_counter() + args.seconds
+        threads = [
+            threading.Thread(target=_load, args=(base_url, token, deadline, latencies), daemon=True)
+            for latencies in per_thread
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    ordered = sorted(latency for latencies in per_thread for latency in latencies)
+    p50 = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:<18} {len(ordered) / elapsed:8.1f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=32, help="concurrent client threads")
+    parser.add_argument("--seconds", type=float, default=10, help="length of each run")
+    parser.add_argument("--cache-ttl", type=int, default=0, help="AUTH_CACHE_TTL for the server")
+    parser.add_argument("--database-url", help="database to run against (default: throwaway SQLite)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    create_user()
+
+    print(f"/api/auth/me, {args.threads} threads, {args.seconds:g}s per run, "
+          f"AUTH_CACHE_TTL={args.cache_ttl}")
+    for label, async_db in (("sync engine", "0"), ("async engine", "1")):
+        _measure(label, {"DB_ASYNC": async_db, "AUTH_CACHE_TTL": str(args.cache_ttl)}, args)
+
+
+if __name__ == "__main__":
+    main()
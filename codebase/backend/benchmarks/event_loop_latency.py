@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: /health latency while logins and searches are running.
+
+Starts the API in a uvicorn subprocess on a throwaway SQLite database (so
+the load generator doesn't share its GIL), measures /health latency on an
+idle server, then again while background threads hammer /api/auth/login
+(bcrypt) and /api/search. If handlers block the event loop, the loaded p99
+for /health grows to several bcrypt verifies queued back to back; with the
+work on the thread pool it stays flat. On a machine with fewer cores than
+load threads, the loaded numbers also include plain CPU contention.
+
+Usage:
+    python benchmarks/event_loop_latency.py [--workers 16] [--probes 300]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from _harness import PASSWORD, USERNAME, create_user, free_port, start_server
+
+import requests
+
+
+def _probe(base_url: str, count: int) -> list:
+    session = requests.Session()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        session.get(f"{base_url}/health").raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    return latencies
+
+
+def _load(base_url: str, stop: threading.Event, index: int, counts: list) -> None:
+    session = requests.Session()
+    while not stop.is_set():
+        if index % 2 == 0:
+            session.post(
+                f"{base_url}/api/auth/login",
+                data={"username": USERNAME, "password": PASSWORD}
+            ).raise_for_status()
+        else:
+            # Vary the query so the response cache doesn't absorb the load
+            session.get(f"{base_url}/api/search", params={"q": "星", "limit": counts[index] % 5 + 1})
+        counts[index] += 1
+
+
+def _summary(label: str, latencies: list) -> str:
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"{label:<28} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   max {ordered[-1]:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=16, help="background login/search threads")
+    parser.add_argument("--probes", type=int, default=300, help="/health requests per phase")
+    args = parser.parse_args()
+
+    create_user()
+    port = free_port()
+    server = start_server(port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _run(base_url, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _run(base_url: str, args: argparse.Namespace) -> None:
+    _probe(base_url, 20)  # warm up connections and the catalog
+    idle = _probe(base_url, args.probes)
+
+    stop = threading.Event()
+    counts = [0] * args.workers
+    loaders = [
+        threading.Thread(target=_load, args=(base_url, stop, i, counts), daemon=True)
+        for i in range(args.workers)
+    ]
+    for thread in loaders:
+        thread.start()
+    started = time.perf_counter()
+    loaded = _probe(base_url, args.probes)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in loaders:
+        thread.join()
+
+    logins = sum(counts[0::2])
+    searches = sum(counts[1::2])
+    print(_summary("/health idle", idle))
+    print(_summary("/health under load", loaded))
+    print(f"background load: {logins / elapsed:.1f} logins/s, {searches / elapsed:.1f} searches/s "
+          f"({args.workers} threads)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark: serializing a large song list to a JSON response body.
+
+Builds a synthetic catalog of Song models and times the old path
+(jsonable_encoder followed by json.dumps, as FastAPI does by default)
+against services.serialization.dump_json, which encodes the models in one
+pass with pydantic-core. orjson is timed as well when it is installed,
+using model_dump as its fallback for models. Every path is checked to
+produce the same JSON document.
+
+Usage:
+    python benchmarks/json_serialization.py [--songs 10000] [--rounds 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from fastapi.encoders import jsonable_encoder
+
+from models import Song
+from services.serialization import dump_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _catalog(count: int) -> list:
+    return [
+        Song(
+            title=f"彗星ハネムーン {i}",
+            artist="星街すいせい",
+            Release_date=f"20{10 + i % 15:02d}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            source=f"https://www.youtube.com/watch?v={i:011d}",
+            description="Original song. 作詞・作曲: 星街すいせい " * 4,
+            archived_by="archive_bot",
+            archived_date="2024-01-01T00:00:00",
+            audio="audio.flac",
+            thumbnail="thumbnail.jpg",
+            analysis=""
+        )
+        for i in range(count)
+    ]
+
+
+def _old(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode('utf-8')
+
+
+def _orjson(content) -> bytes:
+    return orjson.dumps(content, default=lambda model: model.model_dump())
+
+
+def _time(serialize, content, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        serialize(content)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--songs", type=int, default=10000, help="songs in the synthetic catalog")
+    parser.add_argument("--rounds", type=int, default=10, help="timed runs per serializer")
+    args = parser.parse_args()
+
+    content = {"songs": _catalog(args.songs)}
+    serializers = [("jsonable_encoder + json.dumps", _old), ("dump_json (pydantic-core)", dump_json)]
+    if orjson is not None:
+        serializers.append(("orjson + model_dump", _orjson))
+
+    expected = json.loads(_old(content))
+    baseline = None
+    for label, serialize in serializers:
+        body = serialize(content)
+        if json.loads(body) != expected:
+            raise SystemExit(f"{label} produced a different document")
+        median = statistics.median(_time(serialize, content, args.rounds))
+        baseline = baseline or median
+        print(f"{label:<32} {median:8.2f} ms   {baseline / median:5.1f}x   {len(body) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+"""
+Build the embedding matrix behind /api/works/{id}/similar.
+
+Every work's metadata, lyrics and analysis.md are turned into TF-IDF
+vectors, reduced with a truncated SVD and saved as normalized embeddings.
+The running API picks up the new file on its next request, so rebuild
+after large ingests.
+
+Usage:
+    python database/build_similarity.py [--archive /archive] [--output path.npz] [--dimensions 128]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from services.catalog import ARCHIVE_ROOT, Catalog
+from services.similarity import DIMENSIONS, SIMILARITY_PATH, build_embeddings, save_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--archive", type=Path, default=ARCHIVE_ROOT, help="archive root containing creators/")
+    parser.add_argument("--output", type=Path, default=SIMILARITY_PATH, help="where to write the embeddings")
+    parser.add_argument("--dimensions", type=int, default=DIMENSIONS, help="embedding dimensions kept")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    source = Catalog(args.archive)
+    source.refresh(force=True)
+    ids, embeddings, terms = build_embeddings(source.works(), dimensions=args.dimensions)
+    save_embeddings(args.output, ids, embeddings)
+
+    print(f"Embedded {len(ids)} works in {time.perf_counter() - started:.2f}s")
+    print(f"  terms:      {terms}")
+    print(f"  dimensions: {embeddings.shape[1]}")
+    print(f"  written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+Export every work's metadata as NDJSON, one work per line.
+
+Reads metadata.json files straight from the archive one at a time and
+writes them out in chunks, so memory stays flat however many works there
+are. --since keeps works updated at or after a timestamp for incremental
+pulls; output ending in .gz (or --gzip) is compressed on the fly.
+
+Usage:
+    python database/export_catalog.py [--archive /archive] [--since 2025-12-01] [--output catalog.ndjson.gz]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from services.catalog import ARCHIVE_ROOT
+from services.export import archive_documents, export_stream, parse_since
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--archive", type=Path, default=ARCHIVE_ROOT, help="archive root containing creators/")
+    parser.add_argument("--since", help="only works last updated at or after this ISO 8601 date or datetime")
+    parser.add_argument("--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("--gzip", action="store_true", help="compress the output (implied by a .gz output)")
+    args = parser.parse_args()
+
+    try:
+        since = parse_since(args.since) if args.since else None
+    except ValueError as e:
+        parser.error(str(e))
+    compress = args.gzip or args.output.endswith(".gz")
+
+    started = time.perf_counter()
+    written = 0
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb')
+    try:
+        for chunk in export_stream(archive_documents(args.archive), since=since, compress=compress):
+            out.write(chunk)
+            written += len(chunk)
+    except OSError as e:
+        sys.exit(f"Export aborted: {e}")
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    print(
+        f"Exported {written} bytes from {args.archive} in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
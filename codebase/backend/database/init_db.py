@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+"""
+Create the database schema.
+
+Run once per deploy (before starting the API with DB_CREATE_SCHEMA=0) so
+no API process has to create tables on its first request.
+
+Usage:
+    python database/init_db.py
+"""
+
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.connection import engine
+from database.models import Base
+
+
+def main():
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    print(f"Created {len(Base.metadata.tables)} tables (if missing) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Mirror the archive's metadata.json files into the catalog tables
+(creators, works, credits, genres).
+
+Only works whose metadata.json mtime or hash changed are rewritten, so
+running it after every ingest is cheap.
+
+Usage:
+    python database/sync_catalog.py [--archive /archive] [--batch-size 500] [--force] [--allow-empty]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Add project root to sys.path for command-line execution
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.connection import SessionLocal, engine
+from database.models import Base
+from services.catalog import ARCHIVE_ROOT
+from services.catalog_sync import BATCH_SIZE, sync_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--archive", type=Path, default=ARCHIVE_ROOT, help="archive root containing creators/")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="works per INSERT batch")
+    parser.add_argument("--force", action="store_true", help="rewrite every work, even if unchanged")
+    parser.add_argument(
+        "--allow-empty", action="store_true", help="empty the tables if the archive has no works"
+    )
+    args = parser.parse_args()
+
+    # Create tables
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        stats = sync_catalog(
+            db, args.archive, batch_size=args.batch_size, force=args.force, allow_empty=args.allow_empty
+        )
+    except (OSError, RuntimeError) as e:
+        sys.exit(f"Sync aborted: {e}")
+    finally:
+        db.close()
+
+    print(f"Synced {stats.scanned} works in {time.perf_counter() - started:.2f}s")
+    print(f"  upserted:  {stats.upserted}")
+    print(f"  touched:   {stats.touched} (mtime only)")
+    print(f"  unchanged: {stats.unchanged}")
+    print(f"  removed:   {stats.removed}")
+    if stats.failed:
+        print(f"  failed:    {stats.failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from database.connection import get_db
-from services.auth import authenticate_user, create_access_token, get_user
+from services.auth import authenticate_user, create_access_token, get_cached_user_async
 from models import Token, UserLogin, TokenData
 
 router = APIRouter()
@@ -15,7 +15,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 SECRET_KEY = "your-secret-key-here"  # Should be in env
 ALGORITHM = "HS256"
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# No get_db dependency: the user usually comes from the cache, and a
+# session is only opened on a miss. Async so that a cache hit (or an async
+# engine lookup) does not take a worker thread per request
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,7 +32,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = await get_cached_user_async(token_data.username, payload.get("exp"))
     if user is None:
         raise credentials_exception
     return user
@@ -42,8 +45,10 @@ def get_current_admin_user(current_user = Depends(get_current_user)):
         )
     return current_user
 
+# Sync handler: bcrypt verification takes tens of milliseconds and must run
+# on the worker thread pool rather than the event loop.
 @router.post("/login", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
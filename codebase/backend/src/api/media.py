@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+import os
+
+from services.catalog import WorkRecord, catalog
+from services.thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_WIDTHS, thumbnail_for
+
+router = APIRouter()
+
+AUDIO_MEDIA_TYPES = {
+    ".flac": "audio/flac",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".wav": "audio/wav",
+    ".opus": "audio/ogg",
+}
+
+def _work_or_404(creator_id: str, work_id: str) -> WorkRecord:
+    record = catalog.get(creator_id, work_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Work not found")
+    return record
+
+def _not_modified(request: Request, response: FileResponse) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the file's validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response.headers["etag"]
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags or "*" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(response.headers["last-modified"])
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
+
+def file_response(request: Request, path: Path, media_type: str) -> Response:
+    """
+    Serve a file with Range, If-Range and conditional request support.
+
+    Range requests are answered with 206 Partial Content by Starlette's
+    FileResponse, which streams in fixed-size chunks so memory stays flat
+    per listener, and hands whole-file responses to the server with the
+    ASGI pathsend extension (sendfile) when the server offers it.
+    """
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    response = FileResponse(path, media_type=media_type, stat_result=stat_result)
+    if _not_modified(request, response):
+        headers = {
+            name: response.headers[name]
+            for name in ("etag", "last-modified", "accept-ranges")
+        }
+        return Response(status_code=304, headers=headers)
+    return response
+
+@router.api_route("/audio/{creator_id}/{work_id}", methods=["GET", "HEAD"])
+def stream_audio(creator_id: str, work_id: str, request: Request):
+    """Stream a work's archived audio file, with HTTP Range support for seeking"""
+    record = _work_or_404(creator_id, work_id)
+    files = record.metadata.get('files')
+    audio = files.get('audio') if isinstance(files, dict) else None
+    if not audio:
+        raise HTTPException(status_code=404, detail="Work has no audio file")
+
+    path = record.path / Path(audio).name
+    media_type = AUDIO_MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    return file_response(request, path, media_type)
+
+@router.get("/thumbnail/{creator_id}/{work_id}")
+def get_thumbnail(
+    creator_id: str,
+    work_id: str,
+    request: Request,
+    w: int = Query(THUMBNAIL_WIDTHS[1], ge=1, le=4096),
+    format: str = Query("webp", pattern="^(" + "|".join(THUMBNAIL_FORMATS) + ")$")
+):
+    """
+    Serve a resized thumbnail for list and grid views.
+
+    w is rounded up to the nearest prebuilt width. Derivatives missing from
+    the archive are generated once and cached.
+    """
+    record = _work_or_404(creator_id, work_id)
+    found = thumbnail_for(record, w, format)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Work has no thumbnail")
+
+    path, media_type = found
+    return file_response(request, path, media_type)
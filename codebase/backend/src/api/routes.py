@@ -1,128 +1,390 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-import os
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from urllib.parse import quote
 import json
-from pathlib import Path
 
-from models import Creator, Song, SearchResponse, SearchResult
+from models import (
+    Creator, FacetsResponse, LyricsSearchResponse, SimilarResponse, Song, SearchResponse, SuggestResponse,
+    WorkDetail
+)
+from services.cache import response_cache
+from services.catalog import WorkRecord, catalog
+from services.export import catalog_documents, export_stream, parse_since
+from services.lyrics_index import HITS_PER_WORK, LANGUAGES, lyrics_index
+from services.profiling import phase
+from services.search_index import FACET_FIELDS, SearchPage, search_index
+from services.similarity import similarity_index
+from services.suggest import MAX_COMPLETIONS, suggest_index
 
 router = APIRouter()
 
-# Get the archive root path
-ARCHIVE_ROOT = Path(os.getenv("ARCHIVE_ROOT", "/archive"))  # Mounted volume in Docker
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 200
 
-def get_creators_from_archive() -> List[Creator]:
-    """Get list of creators from archive directory"""
-    creators = []
-    creators_dir = ARCHIVE_ROOT / "creators"
-
-    if not creators_dir.exists():
-        return creators
-
-    for creator_dir in creators_dir.iterdir():
-        if creator_dir.is_dir() and not creator_dir.name.startswith('_'):
-            # Count works (simplified - count music singles for now)
-            music_dir = creator_dir / "Music" / "Singles"
-            works_count = len(list(music_dir.glob("*/metadata.json"))) if music_dir.exists() else 0
-
-            creator = Creator(
-                id=creator_dir.name,
-                name=creator_dir.name.replace('_', ' '),
-                worksCount=works_count,
-                completeness=0.5  # Placeholder
-            )
-            creators.append(creator)
+# Fields returned by ?view=summary, enough for a list or grid card
+SONG_SUMMARY_FIELDS = ("title", "artist", "Release_date", "thumbnail")
+SEARCH_SUMMARY_FIELDS = ("id", "creatorId", "title", "type", "release_date", "thumbnailUrl")
+
+# How each SearchResult field is read off a catalog record
+SEARCH_RESULT_FIELDS: Dict[str, Callable[[WorkRecord], Any]] = {
+    "id": lambda record: record.id,
+    "creatorId": lambda record: record.creator_id,
+    "title": lambda record: record.song.title,
+    "artist": lambda record: record.song.artist,
+    "type": lambda record: record.metadata.get('type', 'song'),
+    "release_date": lambda record: record.song.Release_date,
+    "thumbnail": lambda record: f"creators/{record.creator_id}/Music/Singles/{record.folder}/thumbnail.jpg",
+    "thumbnailUrl": lambda record: f"/api/thumbnail/{quote(record.id)}",
+    "description": lambda record: record.song.description,
+    "source": lambda record: record.song.source,
+}
 
-    return creators
+def get_creators_from_archive() -> List[Creator]:
+    """Get list of creators from the archive catalog"""
+    return catalog.creators()
 
 def get_songs_for_creator(creator_id: str) -> List[Song]:
     """Get songs for a specific creator"""
-    songs = []
-    creator_dir = ARCHIVE_ROOT / "creators" / creator_id / "Music" / "Singles"
-
-    if not creator_dir.exists():
-        return songs
-
-    for song_dir in creator_dir.iterdir():
-        if song_dir.is_dir():
-            metadata_file = song_dir / "metadata.json"
-            if metadata_file.exists():
-                try:
-                    with open(metadata_file, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-
-                    song = Song(
-                        title=metadata.get('title', ''),
-                        artist=metadata.get('artist', ''),
-                        Release_date=metadata.get('release_date', ''),
-                        source=metadata.get('source', {}).get('url', ''),
-                        description=metadata.get('description', ''),
-                        archived_by=metadata.get('archived_by', ''),
-                        archived_date=metadata.get('archived_date', ''),
-                        audio=metadata.get('files', {}).get('audio', ''),
-                        thumbnail=metadata.get('files', {}).get('thumbnail', ''),
-                        analysis=metadata.get('analysis', '')
-                    )
-                    songs.append(song)
-                except (json.JSONDecodeError, KeyError):
-                    continue
-
-    return songs
+    return catalog.songs(creator_id)
+
+def _search_page(**kwargs) -> SearchPage:
+    try:
+        return search_index.search(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _select_fields(
+    fields: Optional[str],
+    view: Optional[str],
+    available: Sequence[str],
+    summary: Sequence[str]
+) -> Optional[List[str]]:
+    """Resolve ?fields= / ?view= into the field list to return; None means every field"""
+    if fields:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return names
+    if view == "summary":
+        return list(summary)
+    return None
+
+def _search_result(record: WorkRecord, fields: Sequence[str]) -> Dict[str, Any]:
+    # Plain dicts: results are projected before serialization, with no
+    # SearchResult model built per hit
+    return {name: SEARCH_RESULT_FIELDS[name](record) for name in fields}
+
+# Handlers are plain functions: FastAPI runs them on its bounded worker
+# thread pool, so archive scans never block the event loop.
 
 @router.get("/creator", response_model=dict)
-async def list_creators():
+def list_creators(request: Request):
     """List all creators in the archive"""
-    creators = get_creators_from_archive()
-    return {"creators": [creator.dict() for creator in creators]}
+    def build():
+        return {"creators": get_creators_from_archive()}, {}
+
+    return response_cache.respond(request, build)
 
 @router.get("/creator/{creator_id}/songs", response_model=List[Song])
-async def get_creator_songs(creator_id: str):
-    """Get all songs for a specific creator"""
-    songs = get_songs_for_creator(creator_id)
-    return songs
+def get_creator_songs(
+    creator_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = Query(None, pattern="^(summary|full)$")
+):
+    """
+    Get songs for a specific creator, ordered by release date.
+
+    Without limit every song is returned. With limit, the X-Next-Cursor
+    response header carries the cursor for the following page. fields (a
+    comma-separated list) or view=summary trims each song to those fields.
+    """
+    selected = _select_fields(fields, view, list(Song.model_fields), SONG_SUMMARY_FIELDS)
+
+    def project(songs: List[Song]) -> list:
+        if selected is None:
+            return songs
+        return [{name: getattr(song, name) for name in selected} for song in songs]
+
+    def build():
+        if limit is None and cursor is None:
+            return project(get_songs_for_creator(creator_id)), {}
+
+        page = _search_page(creator=creator_id, limit=limit, cursor=cursor)
+        headers = {"X-Total-Count": str(page.total)}
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return project([record.song for record in page.records]), headers
+
+    return response_cache.respond(request, build)
 
 @router.get("/search", response_model=SearchResponse)
-async def search_works(
+def search_works(
+    request: Request,
     q: Optional[str] = None,
     type: Optional[str] = None,
     creator: Optional[str] = None,
     genre: Optional[str] = None,
     dateFrom: Optional[str] = None,
-    dateTo: Optional[str] = None
+    dateTo: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = Query(None, pattern="^(summary|full)$"),
+    fuzzy: bool = False,
+    theme: Optional[str] = None,
+    year: Optional[str] = None,
+    era: Optional[str] = None,
+    platform: Optional[str] = None,
+    query: Optional[str] = Query(None, max_length=1000)
 ):
-    """Search for works across all creators"""
-    results = []
-
-    # Simple implementation - search through all songs
-    creators = get_creators_from_archive()
-
-    for creator_obj in creators:
-        if creator and creator_obj.id != creator:
-            continue
-
-        songs = get_songs_for_creator(creator_obj.id)
-        for song in songs:
-            # Simple text search
-            if q:
-                search_text = f"{song.title} {song.artist} {song.description}".lower()
-                if q.lower() not in search_text:
-                    continue
-
-            # Type filter
-            if type and type != "song":
-                continue
-
-            result = SearchResult(
-                id=f"{creator_obj.id}/{song.title}",
-                creatorId=creator_obj.id,
-                title=song.title,
-                artist=song.artist,
-                type="song",
-                release_date=song.Release_date,
-                thumbnail=f"creators/{creator_obj.id}/Music/Singles/{song.title}/thumbnail.jpg",
-                description=song.description,
-                source=song.source
+    """
+    Search for works across all creators.
+
+    Results are ranked by relevance when q is given and listed by release
+    date otherwise. fuzzy=true matches q against titles and romanized
+    titles by trigram similarity, tolerating typos. query takes a boolean
+    query such as composer:"TAKU INOUE" AND year:2020..2023 NOT type:cover.
+    Pass nextCursor back as cursor to fetch the next page. fields (a
+    comma-separated list) or view=summary trims each result.
+    """
+    selected = _select_fields(fields, view, list(SEARCH_RESULT_FIELDS), SEARCH_SUMMARY_FIELDS)
+    selected = selected or list(SEARCH_RESULT_FIELDS)
+
+    def build():
+        page = _search_page(
+            q=q,
+            creator=creator,
+            type=type,
+            genre=genre,
+            date_from=dateFrom,
+            date_to=dateTo,
+            limit=limit,
+            cursor=cursor,
+            fuzzy=fuzzy,
+            theme=theme,
+            year=year,
+            era=era,
+            platform=platform,
+            query=query
+        )
+        results = [_search_result(record, selected) for record in page.records]
+        return {"results": results, "total": page.total, "nextCursor": page.next_cursor}, {}
+
+    return response_cache.respond(request, build)
+
+@router.get("/search/lyrics", response_model=LyricsSearchResponse)
+def search_lyrics(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    lang: Optional[str] = Query(None, pattern="^(" + "|".join(LANGUAGES) + ")$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    hits: int = Query(HITS_PER_WORK, ge=1, le=50)
+):
+    """
+    Search lyrics line by line across Japanese, romaji and English.
+
+    Works with the most matching lines come first. Each result lists up to
+    hits matching lines with their language, line number and a
+    highlighted snippet.
+    """
+    def build():
+        try:
+            page = lyrics_index.search(q, lang=lang, limit=limit, cursor=cursor, hits=hits)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        results = [
+            {
+                "id": match.record.id,
+                "creatorId": match.record.creator_id,
+                "title": match.record.song.title,
+                "matches": match.matches,
+                "hits": [
+                    {
+                        "lang": hit.lang,
+                        "line": hit.line,
+                        "text": hit.text,
+                        "snippet": hit.snippet,
+                        "highlights": hit.highlights,
+                    }
+                    for hit in match.hits
+                ],
+            }
+            for match in page.results
+        ]
+        return {"results": results, "total": page.total, "nextCursor": page.next_cursor}, {}
+
+    return response_cache.respond(request, build)
+
+@router.get("/facets", response_model=FacetsResponse)
+def search_facets(
+    request: Request,
+    q: Optional[str] = None,
+    type: Optional[str] = None,
+    creator: Optional[str] = None,
+    genre: Optional[str] = None,
+    theme: Optional[str] = None,
+    year: Optional[str] = None,
+    era: Optional[str] = None,
+    platform: Optional[str] = None,
+    dateFrom: Optional[str] = None,
+    dateTo: Optional[str] = None,
+    fuzzy: bool = False,
+    facets: Optional[str] = None,
+    size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    query: Optional[str] = Query(None, max_length=1000)
+):
+    """
+    Count matching works per facet value, for filter sidebars.
+
+    Takes the same query and filters as /search. facets is a
+    comma-separated subset of creator, type, genre, theme, year, era and
+    platform (default: all); size caps the values returned per facet, most
+    frequent first.
+    """
+    fields = _select_fields(facets, None, FACET_FIELDS, FACET_FIELDS) or list(FACET_FIELDS)
+
+    def build():
+        try:
+            total, counts = search_index.facet_counts(
+                q=q,
+                fuzzy=fuzzy,
+                filters={
+                    'creator': creator, 'type': type, 'genre': genre,
+                    'theme': theme, 'year': year, 'era': era, 'platform': platform,
+                },
+                date_from=dateFrom,
+                date_to=dateTo,
+                fields=fields,
+                size=size,
+                query=query
             )
-            results.append(result)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {
+            "total": total,
+            "facets": {
+                field: [{"value": value, "count": count} for value, count in values]
+                for field, values in counts.items()
+            }
+        }, {}
+
+    return response_cache.respond(request, build)
+
+@router.get("/suggest", response_model=SuggestResponse)
+def suggest(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=MAX_COMPLETIONS)
+):
+    """
+    Typeahead completions for titles, albums and credited names.
+
+    Served from an in-memory prefix index, so it is cheap enough to call on
+    every keystroke.
+    """
+    suggestions = suggest_index.suggest(q, limit)
+    return {
+        "suggestions": [
+            {
+                "text": suggestion.text,
+                "field": suggestion.field,
+                "workId": suggestion.works[0] if len(suggestion.works) == 1 else None,
+                "works": len(suggestion.works),
+            }
+            for suggestion in suggestions
+        ]
+    }
+
+@router.get("/works/{creator_id}/{work_id}", response_model=WorkDetail)
+def get_work(creator_id: str, work_id: str):
+    """Get one work's full metadata, lyrics and analysis"""
+    record = catalog.get(creator_id, work_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Work not found")
+
+    lyrics = None
+    lyrics_text = record.read_file(record.lyrics_file)
+    if lyrics_text is not None:
+        try:
+            with phase("json_parse"):
+                lyrics = json.loads(lyrics_text)
+        except json.JSONDecodeError:
+            lyrics = None
+        # A list or bare value is as unusable as a missing file
+        if not isinstance(lyrics, dict):
+            lyrics = None
+
+    analysis = record.read_file("analysis.md")
+    with phase("validation"):
+        return WorkDetail(
+            id=record.id,
+            creatorId=record.creator_id,
+            metadata=record.metadata,
+            lyrics=lyrics,
+            analysis=analysis
+        )
+
+@router.get("/works/{creator_id}/{work_id}/similar", response_model=SimilarResponse)
+def get_similar_works(
+    creator_id: str,
+    work_id: str,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Works most like this one by their metadata, lyrics and analysis.
+
+    Neighbours come from the embeddings written by
+    database/build_similarity.py; works added since the last build have
+    no neighbours yet.
+    """
+    if catalog.get(creator_id, work_id) is None:
+        raise HTTPException(status_code=404, detail="Work not found")
+    if not similarity_index.available:
+        raise HTTPException(status_code=503, detail="Similarity index has not been built")
+
+    def build():
+        neighbours = similarity_index.similar(f"{creator_id}/{work_id}", limit=limit)
+        results = [
+            {
+                "id": record.id,
+                "creatorId": record.creator_id,
+                "title": record.song.title,
+                "score": round(score, 4),
+            }
+            for record, score in neighbours
+        ]
+        return {"results": results, "builtAt": similarity_index.built_at}, {}
+
+    # A rebuilt matrix changes the neighbours without changing the catalog
+    return response_cache.respond(request, build, version=similarity_index.version)
+
+@router.get("/export")
+def export_catalog(request: Request, since: Optional[str] = Query(None, max_length=64)):
+    """
+    Stream every work's metadata as NDJSON, one work per line.
+
+    since (an ISO 8601 date or datetime) keeps works whose last_updated is
+    at or after it, for incremental pulls. The body is gzip-compressed on
+    the fly when the client sends Accept-Encoding: gzip.
+    """
+    try:
+        cutoff = parse_since(since) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return SearchResponse(results=results, total=len(results))
\ No newline at end of file
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    # Not cached: the body is produced while it is sent
+    return StreamingResponse(
+        export_stream(catalog_documents(catalog.works()), since=cutoff, compress=compress),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -14,4 +14,56 @@ class User(Base):
     role = Column(String, default="user")  # 'admin' or 'user'
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+# Archive catalog, mirrored from each work's metadata.json by
+# services/catalog_sync.py. The files stay the source of truth.
+
+class CatalogCreator(Base):
+    __tablename__ = "creators"
+
+    id = Column(String, primary_key=True)  # Folder name under creators/
+    name = Column(String, nullable=False)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Work(Base):
+    __tablename__ = "works"
+
+    id = Column(String, primary_key=True)  # "<creator>/<work folder>"
+    creator_id = Column(String, ForeignKey("creators.id", ondelete="CASCADE"), index=True, nullable=False)
+    folder = Column(String, nullable=False)
+    title = Column(String, nullable=False, default="")
+    title_native = Column(String)
+    title_romanized = Column(String)
+    type = Column(String, index=True)
+    release_date = Column(String, index=True)  # May be partial ("2021", "2021-07") or empty
+    archived_date = Column(String)
+    last_updated = Column(String, index=True)
+    language = Column(String)
+    platform = Column(String)
+    source_url = Column(String)
+    album = Column(String)
+    era = Column(String)
+    duration_seconds = Column(Integer)
+    file_size_bytes = Column(BigInteger)
+    document = Column(JSON, nullable=False)  # The full metadata.json
+    metadata_hash = Column(String(64), nullable=False)  # sha256 of metadata.json
+    metadata_mtime_ns = Column(BigInteger, nullable=False)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Credit(Base):
+    __tablename__ = "credits"
+
+    id = Column(Integer, primary_key=True)
+    work_id = Column(String, ForeignKey("works.id", ondelete="CASCADE"), index=True, nullable=False)
+    role = Column(String, nullable=False)  # composer, lyricist, ...
+    name = Column(String, index=True, nullable=False)
+
+
+class Genre(Base):
+    __tablename__ = "genres"
+
+    work_id = Column(String, ForeignKey("works.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String, primary_key=True, index=True)
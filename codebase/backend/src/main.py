@@ -1,23 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import os
+import anyio.to_thread
 from dotenv import load_dotenv
 
 from api.routes import router
+from api.media import router as media_router
 from api.auth import router as auth_router
-from database.connection import engine
-from database.models import Base
+from services import metrics, profiling, warmup
+from services.catalog import catalog
+from services.serialization import FastJSONResponse
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Upper bound on concurrent sync handlers (archive scans, bcrypt, DB calls)
+THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "40"))
+
+# Worker processes when started with `python main.py`; each scans the
+# archive and builds its own catalog and indexes
+WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # Scan the archive and build the indexes in the background, so the
+    # process serves (and /ready reports progress) right away
+    task = asyncio.create_task(warmup.run())
+    # Later archive changes are picked up by a watcher thread, not by requests
+    catalog.watch()
+    yield
+    task.cancel()
+    await anyio.to_thread.run_sync(catalog.stop)
 
 app = FastAPI(
     title="Library of Babylon API",
     description="API for the Library of Babylon archival system",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -29,8 +53,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histogram, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Opt-in request profiling (PROFILE_SAMPLE_RATE / PROFILE_HEADER)
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
+app.include_router(media_router, prefix="/api", tags=["media"])
 app.include_router(auth_router, prefix="/api/auth", tags=["authentication"])
 
 @app.get("/")
@@ -41,6 +73,15 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until the archive catalog and indexes are warm, with their generations and build times"""
+    return JSONResponse(warmup.readiness(), status_code=200 if warmup.state.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
\ No newline at end of file
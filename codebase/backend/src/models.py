@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 class Creator(BaseModel):
     id: str
@@ -27,12 +27,67 @@ class SearchResult(BaseModel):
     type: str
     release_date: str
     thumbnail: str
+    thumbnailUrl: str
     description: str
     source: str
 
+class WorkDetail(BaseModel):
+    id: str
+    creatorId: str
+    metadata: Dict[str, Any]
+    lyrics: Optional[Dict[str, Any]] = None
+    analysis: Optional[str] = None
+
 class SearchResponse(BaseModel):
     results: List[SearchResult]
     total: int
+    nextCursor: Optional[str] = None
+
+class LyricsHit(BaseModel):
+    lang: str  # 'ja', 'ja_romaji' or 'en'
+    line: int  # 1-based line number within that language version
+    text: str
+    snippet: str  # HTML-escaped line with matches wrapped in <mark>
+    highlights: List[List[int]]  # [start, end) offsets of matches in text
+
+class LyricsResult(BaseModel):
+    id: str
+    creatorId: str
+    title: str
+    matches: int  # Matching lines in the work
+    hits: List[LyricsHit]
+
+class LyricsSearchResponse(BaseModel):
+    results: List[LyricsResult]
+    total: int
+    nextCursor: Optional[str] = None
+
+class SimilarWork(BaseModel):
+    id: str
+    creatorId: str
+    title: str
+    score: float  # Cosine similarity of the two works' embeddings
+
+class SimilarResponse(BaseModel):
+    results: List[SimilarWork]
+    builtAt: Optional[str] = None  # When the embeddings were built
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class FacetsResponse(BaseModel):
+    total: int
+    facets: Dict[str, List[FacetCount]]
+
+class Suggestion(BaseModel):
+    text: str
+    field: str  # 'title', 'album' or 'credit'
+    workId: Optional[str] = None  # Set when the phrase belongs to a single work
+    works: int
+
+class SuggestResponse(BaseModel):
+    suggestions: List[Suggestion]
 
 # Authentication models
 class UserLogin(BaseModel):
@@ -1,15 +1,36 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from database.connection import (
+    ASYNC_DB, CREATE_SCHEMA, AsyncSessionLocal, SessionLocal, ensure_schema, ensure_schema_async
+)
 from database.models import User
+from services import metrics
+import anyio.to_thread
 import os
+import threading
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Seconds an authenticated user lookup is reused (never past the token's exp)
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+USER_CACHE_HITS = metrics.counter(
+    "auth_user_cache_hits_total", "Authenticated requests whose user came from the cache"
+)
+USER_CACHE_MISSES = metrics.counter(
+    "auth_user_cache_misses_total", "Authenticated requests that looked the user up in the database"
+)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password, hashed_password):
@@ -40,4 +61,179 @@ def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
 def get_user_by_id(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
\ No newline at end of file
+    return db.query(User).filter(User.id == user_id).first()
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """The users row fields authenticated requests read, detached from any session"""
+    id: int
+    username: str
+    email: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_row(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            role=user.role,
+            is_active=user.is_active
+        )
+
+class UserCache:
+    """
+    Bounded cache of user lookups keyed by (username, token exp).
+
+    Entries expire after AUTH_CACHE_TTL seconds or when the token does,
+    whichever is first, and are dropped as soon as this process commits an
+    update or delete of the user's row; a bulk UPDATE or DELETE on users
+    drops every entry. Rows changed by another process are picked up once
+    the TTL runs out.
+
+    Every invalidation bumps an epoch; a lookup that started before one
+    (and may have read the old row) is not cached.
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, CurrentUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.epoch = 0
+
+    def get(self, username: str, exp: int) -> Optional[CurrentUser]:
+        with self._lock:
+            entry = self._entries.get((username, exp))
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self._entries[(username, exp)]
+                return None
+            self._entries.move_to_end((username, exp))
+            return user
+
+    def set(self, user: CurrentUser, exp: int, epoch: int) -> None:
+        """Cache a lookup that started at epoch, unless an invalidation happened since"""
+        ttl = min(self.ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            self._entries[(user.username, exp)] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end((user.username, exp))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop every entry for one users row, whatever username it was cached under"""
+        with self._lock:
+            self.epoch += 1
+            for key in [key for key, (_, user) in self._entries.items() if user.id == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+user_cache = UserCache()
+
+def load_user(username: str) -> Optional[CurrentUser]:
+    """Look a user up in its own short session"""
+    if CREATE_SCHEMA:
+        ensure_schema()
+    db = SessionLocal()
+    try:
+        user = get_user(db, username)
+        return CurrentUser.from_row(user) if user is not None else None
+    finally:
+        db.close()
+
+async def load_user_async(username: str) -> Optional[CurrentUser]:
+    """load_user on the async engine"""
+    if CREATE_SCHEMA:
+        await ensure_schema_async()
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+        return CurrentUser.from_row(user) if user is not None else None
+
+def _cache_lookup(username: str, exp: int) -> Optional[CurrentUser]:
+    user = user_cache.get(username, exp)
+    if user is not None:
+        USER_CACHE_HITS.inc()
+    else:
+        USER_CACHE_MISSES.inc()
+    return user
+
+def get_cached_user(username: str, exp: Optional[int]) -> Optional[CurrentUser]:
+    """The user a verified token names, from the cache when the same token was seen recently"""
+    if not isinstance(exp, int):
+        return load_user(username)
+    user = _cache_lookup(username, exp)
+    if user is None:
+        epoch = user_cache.epoch
+        user = load_user(username)
+        if user is not None:
+            user_cache.set(user, exp, epoch)
+    return user
+
+async def get_cached_user_async(username: str, exp: Optional[int]) -> Optional[CurrentUser]:
+    """
+    get_cached_user for async handlers. A cache hit never leaves the event
+    loop; a miss awaits the async engine with DB_ASYNC set, and otherwise
+    runs the sync lookup on the worker thread pool.
+    """
+    user = _cache_lookup(username, exp) if isinstance(exp, int) else None
+    if user is not None:
+        return user
+    epoch = user_cache.epoch
+    if ASYNC_DB:
+        user = await load_user_async(username)
+    else:
+        user = await anyio.to_thread.run_sync(load_user, username)
+    if user is not None and isinstance(exp, int):
+        user_cache.set(user, exp, epoch)
+    return user
+
+# Session.info key collecting the ids of the users rows a transaction changed
+_CHANGED_USERS = "auth_changed_user_ids"
+# Session.info key set when a transaction ran a bulk UPDATE or DELETE on users
+_BULK_CHANGED_USERS = "auth_bulk_changed_users"
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # Flushed changes may still roll back, so only note the row here and
+    # drop its entries once the commit lands. Entries are matched by id, so
+    # a rename drops the one cached under the old username too.
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_change(orm_execute_state):
+    # query(User).update()/delete() and update(User)/delete(User) skip the
+    # mapper events above and do not say which rows they hit
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if inspect(User) in orm_execute_state.all_mappers:
+        orm_execute_state.session.info[_BULK_CHANGED_USERS] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    if session.info.pop(_BULK_CHANGED_USERS, False):
+        session.info.pop(_CHANGED_USERS, None)
+        user_cache.clear()
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        user_cache.invalidate(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_CHANGED_USERS, None)
+        session.info.pop(_BULK_CHANGED_USERS, None)
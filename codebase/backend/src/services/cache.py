@@ -0,0 +1,177 @@
+"""
+Response cache for the read-only archive endpoints.
+
+Serialized responses are stored in Redis (shared by every worker) keyed by
+route, normalized query string and the catalog fingerprint, so an archive
+change simply makes old entries unreachable until their TTL runs out. When
+REDIS_URL is unset or Redis cannot be reached, an in-process LRU is used
+instead so the API and its tests run without any services.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from services import metrics
+from services.catalog import catalog
+from services.profiling import phase
+from services.serialization import dump_json
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is optional for local runs
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+# Seconds to wait before trying Redis again after a connection failure
+REDIS_RETRY_INTERVAL = 30.0
+
+KEY_PREFIX = "lob:response:"
+
+CACHE_HITS = metrics.counter("response_cache_hits_total", "Responses served from the cache")
+CACHE_MISSES = metrics.counter("response_cache_misses_total", "Responses built because the cache had no entry")
+NOT_MODIFIED = metrics.counter("response_cache_not_modified_total", "Requests answered with 304 Not Modified")
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with per-entry expiry"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ResponseCache:
+    """Redis-backed byte cache that degrades to an in-process LRU"""
+
+    def __init__(self, redis_url: Optional[str] = REDIS_URL, ttl: int = CACHE_TTL, maxsize: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.local = LRUCache(maxsize)
+        self._redis = None
+        self._redis_down_until = 0.0
+        if redis_url and redis is not None:
+            self._redis = redis.Redis.from_url(
+                redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+
+    def _client(self):
+        if self._redis is None or time.monotonic() < self._redis_down_until:
+            return None
+        return self._redis
+
+    def _redis_failed(self) -> None:
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def get(self, key: str) -> Optional[bytes]:
+        client = self._client()
+        if client is not None:
+            try:
+                return client.get(key)
+            except redis.RedisError:
+                self._redis_failed()
+        return self.local.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(key, value, ex=self.ttl)
+                return
+            except redis.RedisError:
+                self._redis_failed()
+        self.local.set(key, value, self.ttl)
+
+    def respond(
+        self,
+        request: Request,
+        build: Callable[[], Tuple[Any, Dict[str, str]]],
+        version: str = ""
+    ) -> Response:
+        """
+        Serve a cached JSON response for this request, building it on a miss.
+
+        build returns the response content and any extra headers. The ETag is
+        derived from the cache key, which embeds the archive fingerprint, so a
+        matching If-None-Match is answered with 304 without touching the cache.
+        version identifies any other data the response is built from (e.g.
+        the similarity matrix) and is embedded in the key the same way.
+        """
+        catalog.refresh()
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+        raw_key = f"{request.url.path}?{urlencode(params)}@{catalog.fingerprint}@{version}"
+        digest = hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+        key = KEY_PREFIX + digest
+        etag = f'"{digest[:20]}"'
+
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        tags = _parse_etags(request.headers.get("if-none-match", ""))
+        if etag in tags or "*" in tags:
+            NOT_MODIFIED.inc()
+            return Response(status_code=304, headers=cache_headers)
+
+        with phase("cache"):
+            cached = self.get(key)
+        if cached is not None:
+            CACHE_HITS.inc()
+            head, _, body = cached.partition(b"\n")
+            headers = json.loads(head)
+        else:
+            CACHE_MISSES.inc()
+            content, headers = build()
+            body = dump_json(content)
+            with phase("cache"):
+                self.set(key, json.dumps(headers).encode('utf-8') + b"\n" + body)
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={**headers, **cache_headers}
+        )
+
+
+def _parse_etags(header: str) -> set:
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,445 @@
+"""
+In-process catalog of the archive.
+
+The catalog is loaded once at startup and keeps parsed Creator/Song records
+in memory, keyed by creator and work folder. Each refresh only stats the
+work folders and re-reads a metadata.json whose mtime or size changed, so
+edits made by the archive scripts are picked up without a restart. The
+stamp covers the lyrics file too, so rewriting lyrics.json in place moves
+the generation (and the fingerprint) like a metadata edit. In the
+API a background thread runs the refresh (Catalog.watch), and request
+threads only read the last state it published.
+
+Between full scans the watcher only stats the creators directory and each
+creator's work directories, and rescans the creators whose directory mtime
+moved. That catches added, removed and renamed works at once; edits inside
+an existing work folder do not touch those directories and are picked up by
+the next full scan, every CATALOG_FULL_SCAN_INTERVAL seconds.
+
+Each worker process keeps its own catalog and indexes, so their memory
+grows with API_WORKERS.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from models import Creator, Song
+from services import metrics
+from services.profiling import phase
+
+# Get the archive root path
+ARCHIVE_ROOT = Path(os.getenv("ARCHIVE_ROOT", "/archive"))  # Mounted volume in Docker
+
+# Minimum seconds between two mtime scans of the archive
+REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "2.0"))
+
+# Seconds between two watcher scans that stat every work, rather than only
+# the creator directories
+FULL_SCAN_INTERVAL = float(os.getenv("CATALOG_FULL_SCAN_INTERVAL", "30.0"))
+
+WORKS_SUBDIR = ("Music", "Singles")
+
+# Lyrics file name when metadata.json does not set files.lyrics
+LYRICS_FILE = "lyrics.json"
+
+# (work folder mtime, metadata.json mtime, metadata.json size,
+#  lyrics mtime, lyrics size); a missing lyrics file stamps as (0, -1)
+Stamp = Tuple[int, int, int, int, int]
+
+# mtimes of a creator folder, its Music folder and its works folder, -1 if missing
+DirStamp = Tuple[int, int, int]
+
+# Undated works sort after every release date in listings
+UNDATED = "\uffff"
+
+SCAN_SECONDS = metrics.histogram(
+    "archive_scan_duration_seconds",
+    "Time taken by one archive mtime scan",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+)
+RELOADS = metrics.counter(
+    "catalog_reloads_total",
+    "Archive scans that found added, changed or removed works"
+)
+SCAN_ERRORS = metrics.counter(
+    "catalog_scan_errors_total",
+    "Background archive scans that raised"
+)
+
+@dataclass
+class WorkRecord:
+    """A single archived work and its parsed metadata"""
+    creator_id: str
+    folder: str
+    path: Path
+    stamp: Stamp
+    metadata: dict
+    song: Song
+    # Companion file contents keyed by file name, with the stat they were read at
+    files: Dict[str, Tuple[Tuple[int, int], str]] = field(default_factory=dict, repr=False)
+
+    @property
+    def id(self) -> str:
+        return f"{self.creator_id}/{self.folder}"
+
+    @property
+    def release_key(self) -> Tuple[str, str]:
+        """Listing order: release date, undated last, then work id"""
+        return self.song.Release_date or UNDATED, self.id
+
+    @property
+    def lyrics_file(self) -> str:
+        """Name of the work's lyrics file in its folder"""
+        files = self.metadata.get('files')
+        files = files if isinstance(files, dict) else {}
+        return files.get('lyrics') or LYRICS_FILE
+
+    def read_file(self, name: str) -> Optional[str]:
+        """
+        Read a companion file (lyrics.json, analysis.md) from the work folder.
+
+        The text is cached on the record and re-read only when the file's
+        mtime or size changes. Returns None if the file does not exist.
+        """
+        path = self.path / Path(name).name
+        try:
+            st = path.stat()
+        except OSError:
+            self.files.pop(name, None)
+            return None
+
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.files.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        try:
+            with phase("filesystem"):
+                text = path.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            return None
+        self.files[name] = (stamp, text)
+        return text
+
+
+def song_from_metadata(metadata: dict) -> Song:
+    """Build the API Song model from a metadata.json document"""
+    source = metadata.get('source', {})
+    if isinstance(source, dict):
+        source = source.get('url', '')
+
+    return Song(
+        title=metadata.get('title', ''),
+        artist=metadata.get('artist', ''),
+        Release_date=metadata.get('release_date', ''),
+        source=source or '',
+        description=metadata.get('description', ''),
+        archived_by=metadata.get('archived_by', ''),
+        archived_date=metadata.get('archived_date', ''),
+        audio=metadata.get('files', {}).get('audio', ''),
+        thumbnail=metadata.get('files', {}).get('thumbnail', ''),
+        analysis=metadata.get('analysis', '')
+    )
+
+
+def _stat_work(work_dir: os.DirEntry, lyrics: str) -> Optional[Stamp]:
+    try:
+        dir_stat = work_dir.stat()
+        meta_stat = os.stat(os.path.join(work_dir.path, "metadata.json"))
+    except OSError:
+        return None
+    try:
+        lyrics_stat = os.stat(os.path.join(work_dir.path, Path(lyrics).name))
+        lyrics_stamp = (lyrics_stat.st_mtime_ns, lyrics_stat.st_size)
+    except OSError:
+        lyrics_stamp = (0, -1)
+    return (dir_stat.st_mtime_ns, meta_stat.st_mtime_ns, meta_stat.st_size, *lyrics_stamp)
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _stat_creator(creator_dir: str) -> DirStamp:
+    music_dir = os.path.join(creator_dir, WORKS_SUBDIR[0])
+    return (_mtime(creator_dir), _mtime(music_dir), _mtime(os.path.join(music_dir, *WORKS_SUBDIR[1:])))
+
+
+def _load_work(creator_id: str, work_dir: os.DirEntry, stamp: Stamp) -> Optional[WorkRecord]:
+    try:
+        with phase("filesystem"), open(os.path.join(work_dir.path, "metadata.json"), 'r', encoding='utf-8') as f:
+            text = f.read()
+        with phase("json_parse"):
+            metadata = json.loads(text)
+        with phase("validation"):
+            song = song_from_metadata(metadata)
+    except (OSError, json.JSONDecodeError, KeyError, AttributeError, ValueError):
+        return None
+
+    return WorkRecord(
+        creator_id=creator_id,
+        folder=work_dir.name,
+        path=Path(work_dir.path),
+        stamp=stamp,
+        metadata=metadata,
+        song=song
+    )
+
+
+class Catalog:
+    """Parsed archive records, refreshed per work by mtime checks"""
+
+    def __init__(
+        self,
+        root: Path,
+        refresh_interval: float = REFRESH_INTERVAL,
+        full_scan_interval: float = FULL_SCAN_INTERVAL
+    ):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.full_scan_interval = full_scan_interval
+        self.generation = 0
+        self.fingerprint = ""
+        self.archived_bytes = 0
+        self._creators: Dict[str, Dict[str, WorkRecord]] = {}
+        # Stamps of works whose metadata could not be read, per creator
+        self._unreadable: Dict[str, Dict[str, Stamp]] = {}
+        self._creators_stamp = -1
+        self._dir_stamps: Dict[str, DirStamp] = {}
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+        self._last_full_scan = 0.0
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __len__(self) -> int:
+        return sum(len(works) for works in self._creators.values())
+
+    @property
+    def creators_dir(self) -> Path:
+        return self.root / "creators"
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-scan the archive if the refresh interval has elapsed.
+
+        Only works whose folder, metadata.json or lyrics stamp changed are
+        re-parsed.
+        Returns True when anything was added, changed or removed. While the
+        catalog is watched, only forced refreshes scan: the watcher thread
+        keeps the published state current.
+        """
+        if not force and (self._watcher is not None
+                          or time.monotonic() - self._last_scan < self.refresh_interval):
+            return False
+
+        with self._lock:
+            if not force and time.monotonic() - self._last_scan < self.refresh_interval:
+                return False
+            return self._publish(full=True)
+
+    def _publish(self, full: bool) -> bool:
+        # Called with self._lock held
+        with SCAN_SECONDS.time(), phase("filesystem"):
+            changed = self._scan(full)
+        self._last_scan = time.monotonic()
+        if full:
+            self._last_full_scan = self._last_scan
+        if changed:
+            self.generation += 1
+            self.fingerprint = self._fingerprint()
+            self.archived_bytes = self._archived_bytes()
+            RELOADS.inc()
+        return changed
+
+    def watch(self) -> None:
+        """
+        Re-scan the archive from a background thread: the creator directories
+        every refresh_interval, every work every full_scan_interval
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        """Stop the watcher thread, waiting for a scan in progress"""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop.set()
+            watcher.join()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            # A forced refresh (the warm-up's first load) may have just run
+            if time.monotonic() - self._last_scan < self.refresh_interval:
+                continue
+            try:
+                with self._lock:
+                    full = time.monotonic() - self._last_full_scan >= self.full_scan_interval
+                    self._publish(full)
+            except Exception:
+                # Keep serving the last published state; the next scan retries
+                SCAN_ERRORS.inc()
+
+    def _fingerprint(self) -> str:
+        """
+        Digest of every work's stamp.
+
+        Unlike the in-process generation counter, this is identical across
+        worker processes that see the same archive, so it can be shared
+        through an external cache.
+        """
+        digest = hashlib.sha1()
+        for creator_id, works in self._creators.items():
+            digest.update(creator_id.encode('utf-8') + b'\0')
+            for folder, record in works.items():
+                digest.update(f"{folder}\0{record.stamp}\0".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _creator_dirs(self, full: bool) -> List[Tuple[str, str]]:
+        """(creator id, path) of every creator folder, listed again only when needed"""
+        creators_dir = str(self.creators_dir)
+        stamp = _mtime(creators_dir)
+        if not full and stamp == self._creators_stamp:
+            return [(creator_id, os.path.join(creators_dir, creator_id)) for creator_id in self._creators]
+        try:
+            entries = sorted(os.scandir(creators_dir), key=lambda e: e.name)
+        except OSError:
+            entries = []
+        self._creators_stamp = stamp
+        return [
+            (entry.name, entry.path) for entry in entries
+            if entry.is_dir() and not entry.name.startswith('_')
+        ]
+
+    def _scan(self, full: bool = True) -> bool:
+        """
+        Update the records from the archive. A full scan stats every work;
+        otherwise only creators whose directory stamp moved are rescanned.
+        """
+        changed = False
+        creators: Dict[str, Dict[str, WorkRecord]] = {}
+        dir_stamps: Dict[str, DirStamp] = {}
+        # Rebuilt every scan, so fixed or deleted works drop out
+        unreadable: Dict[str, Dict[str, Stamp]] = {}
+
+        for creator_id, creator_dir in self._creator_dirs(full):
+            previous = self._creators.get(creator_id, {})
+            dir_stamp = _stat_creator(creator_dir)
+            dir_stamps[creator_id] = dir_stamp
+            if not full and creator_id in self._creators and self._dir_stamps.get(creator_id) == dir_stamp:
+                creators[creator_id] = previous
+                if creator_id in self._unreadable:
+                    unreadable[creator_id] = self._unreadable[creator_id]
+                continue
+
+            works: Dict[str, WorkRecord] = {}
+            previous_unreadable = self._unreadable.get(creator_id, {})
+            creator_unreadable: Dict[str, Stamp] = {}
+
+            works_dir = os.path.join(creator_dir, *WORKS_SUBDIR)
+            try:
+                work_entries = sorted(os.scandir(works_dir), key=lambda e: e.name)
+            except OSError:
+                work_entries = []
+
+            for work_entry in work_entries:
+                if not work_entry.is_dir():
+                    continue
+                record = previous.get(work_entry.name)
+                lyrics = record.lyrics_file if record is not None else LYRICS_FILE
+                stamp = _stat_work(work_entry, lyrics)
+                if stamp is None:
+                    continue
+
+                if record is None or record.stamp != stamp:
+                    # Skip broken metadata until the file is touched again
+                    if previous_unreadable.get(work_entry.name) == stamp:
+                        creator_unreadable[work_entry.name] = stamp
+                        continue
+                    record = _load_work(creator_id, work_entry, stamp)
+                    if record is None:
+                        creator_unreadable[work_entry.name] = stamp
+                        continue
+                    if record.lyrics_file != lyrics:
+                        # The metadata names another lyrics file than the one stamped
+                        record.stamp = _stat_work(work_entry, record.lyrics_file) or stamp
+                    changed = True
+                works[work_entry.name] = record
+
+            if works.keys() != previous.keys() or creator_id not in self._creators:
+                changed = True
+            creators[creator_id] = works
+            if creator_unreadable:
+                unreadable[creator_id] = creator_unreadable
+
+        if creators.keys() != self._creators.keys():
+            changed = True
+
+        self._creators = creators
+        self._dir_stamps = dir_stamps
+        self._unreadable = unreadable
+        return changed
+
+    def _archived_bytes(self) -> int:
+        """Sum of technical.file_size_bytes over every work"""
+        total = 0
+        for works in self._creators.values():
+            for record in works.values():
+                technical = record.metadata.get('technical')
+                if isinstance(technical, dict):
+                    size = technical.get('file_size_bytes')
+                    if isinstance(size, int):
+                        total += size
+        return total
+
+    def creators(self) -> List[Creator]:
+        """Get list of creators with their work counts"""
+        self.refresh()
+        with phase("validation"):
+            return [
+                Creator(
+                    id=creator_id,
+                    name=creator_id.replace('_', ' '),
+                    worksCount=len(works),
+                    completeness=0.5  # Placeholder
+                )
+                for creator_id, works in self._creators.items()
+            ]
+
+    def works(self, creator_id: Optional[str] = None) -> List[WorkRecord]:
+        """Get work records for one creator, or for the whole archive"""
+        self.refresh()
+        if creator_id is not None:
+            return list(self._creators.get(creator_id, {}).values())
+        return [record for works in self._creators.values() for record in works.values()]
+
+    def songs(self, creator_id: str) -> List[Song]:
+        """Get songs for a specific creator, ordered by release date like search listings"""
+        records = sorted(self.works(creator_id), key=lambda record: record.release_key)
+        return [record.song for record in records]
+
+    def get(self, creator_id: str, folder: str) -> Optional[WorkRecord]:
+        """Look up a single work by creator and folder name"""
+        self.refresh()
+        return self._creators.get(creator_id, {}).get(folder)
+
+
+catalog = Catalog(ARCHIVE_ROOT)
+
+metrics.gauge(
+    "archive_bytes",
+    "Bytes of archived media according to metadata technical.file_size_bytes",
+    lambda: catalog.archived_bytes
+)
@@ -0,0 +1,295 @@
+"""
+Mirror the archive's metadata.json files into the catalog tables.
+
+A sync walks creators/<creator>/Music/Singles/*/metadata.json and compares
+each file's mtime with the one stored on its works row. Files with the same
+mtime are skipped without being read; files whose mtime moved but whose
+sha256 is unchanged only get the new mtime recorded. The remaining works
+are upserted in batches (INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and
+SQLite) and their credits and genres rewritten. Works and creators that
+disappeared from the archive are deleted.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from database.models import CatalogCreator, Credit, Genre, Work
+from services.catalog import ARCHIVE_ROOT, WORKS_SUBDIR
+
+# Works upserted per INSERT statement and transaction
+BATCH_SIZE = 500
+
+
+@dataclass
+class SyncStats:
+    """What one sync changed"""
+    scanned: int = 0
+    upserted: int = 0
+    touched: int = 0  # mtime changed, contents identical
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+
+
+@dataclass
+class _Found:
+    creator_id: str
+    folder: str
+    path: str
+    mtime_ns: int
+
+    @property
+    def id(self) -> str:
+        return f"{self.creator_id}/{self.folder}"
+
+
+def _dict(metadata: dict, key: str) -> dict:
+    value = metadata.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _text(value) -> Optional[str]:
+    return value if isinstance(value, str) and value else None
+
+
+def _names(value) -> Iterator[str]:
+    """Individual names from a credit value ("A, B" or a list)"""
+    values = value if isinstance(value, list) else [value]
+    for item in values:
+        if isinstance(item, str):
+            for name in item.split(","):
+                if name.strip():
+                    yield name.strip()
+
+
+def walk_archive(root: Path) -> Iterator[_Found]:
+    """
+    Every work folder with a metadata.json, in creator and folder name order.
+
+    Raises OSError if root/creators cannot be listed (a missing or unmounted
+    archive), so callers cannot mistake it for an empty one.
+    """
+    creator_entries = sorted(os.scandir(root / "creators"), key=lambda e: e.name)
+    for creator_entry in creator_entries:
+        if not creator_entry.is_dir() or creator_entry.name.startswith('_'):
+            continue
+        try:
+            work_entries = sorted(
+                os.scandir(os.path.join(creator_entry.path, *WORKS_SUBDIR)), key=lambda e: e.name
+            )
+        except OSError:
+            continue
+        for work_entry in work_entries:
+            path = os.path.join(work_entry.path, "metadata.json")
+            try:
+                if not work_entry.is_dir():
+                    continue
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            yield _Found(creator_entry.name, work_entry.name, path, mtime_ns)
+
+
+def work_row(found: _Found, metadata: dict, digest: str) -> dict:
+    """Column values of a works row for one metadata.json document"""
+    classification = _dict(metadata, 'classification')
+    technical = _dict(metadata, 'technical')
+    related = _dict(metadata, 'related_works')
+    source = metadata.get('source')
+    if isinstance(source, dict):
+        platform, source_url = _text(source.get('platform')), _text(source.get('url'))
+    else:
+        platform, source_url = None, _text(source)
+
+    duration = technical.get('duration_seconds')
+    size = technical.get('file_size_bytes')
+    return {
+        "id": found.id,
+        "creator_id": found.creator_id,
+        "folder": found.folder,
+        "title": metadata.get('title') or "",
+        "title_native": _text(metadata.get('title_native')),
+        "title_romanized": _text(metadata.get('title_romanized')),
+        "type": _text(metadata.get('type')) or "song",
+        "release_date": _text(metadata.get('release_date')),
+        "archived_date": _text(metadata.get('archived_date')),
+        "last_updated": _text(metadata.get('last_updated')),
+        "language": _text(classification.get('language')),
+        "platform": platform,
+        "source_url": source_url,
+        "album": _text(related.get('album')),
+        "era": _text(related.get('era')),
+        "duration_seconds": duration if isinstance(duration, int) else None,
+        "file_size_bytes": size if isinstance(size, int) else None,
+        "document": metadata,
+        "metadata_hash": digest,
+        "metadata_mtime_ns": found.mtime_ns,
+    }
+
+
+def credit_rows(work_id: str, metadata: dict) -> List[dict]:
+    rows = []
+    for role, value in _dict(metadata, 'credits').items():
+        for name in dict.fromkeys(_names(value)):
+            rows.append({"work_id": work_id, "role": role, "name": name})
+    return rows
+
+
+def genre_rows(work_id: str, metadata: dict) -> List[dict]:
+    genres = _dict(metadata, 'classification').get('genre')
+    names = [genres] if isinstance(genres, str) else genres if isinstance(genres, list) else []
+    unique = dict.fromkeys(name.strip() for name in names if isinstance(name, str) and name.strip())
+    return [{"work_id": work_id, "name": name} for name in unique]
+
+
+def _upsert(db: Session, model, rows: List[dict]) -> None:
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE for a batch of rows"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in rows:
+            db.merge(model(**row))
+        return
+
+    keys = [column.name for column in table.primary_key.columns]
+    stmt = dialect_insert(table)
+    set_ = {name: stmt.excluded[name] for name in rows[0] if name not in keys}
+    if "synced_at" in table.c:
+        # Column onupdate defaults don't fire for ON CONFLICT DO UPDATE
+        set_["synced_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(index_elements=keys, set_=set_)
+    db.execute(stmt, rows)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _read(found: _Found) -> Optional[Tuple[bytes, str]]:
+    try:
+        with open(found.path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    return raw, hashlib.sha256(raw).hexdigest()
+
+
+def _write_batch(db: Session, batch: List[Tuple[_Found, dict, str]]) -> None:
+    creators = {found.creator_id for found, _, _ in batch}
+    _upsert(db, CatalogCreator, [
+        {"id": creator_id, "name": creator_id.replace('_', ' ')} for creator_id in sorted(creators)
+    ])
+    _upsert(db, Work, [work_row(found, metadata, digest) for found, metadata, digest in batch])
+
+    work_ids = [found.id for found, _, _ in batch]
+    db.execute(delete(Credit).where(Credit.work_id.in_(work_ids)))
+    db.execute(delete(Genre).where(Genre.work_id.in_(work_ids)))
+    credits = [row for found, metadata, _ in batch for row in credit_rows(found.id, metadata)]
+    genres = [row for found, metadata, _ in batch for row in genre_rows(found.id, metadata)]
+    if credits:
+        db.execute(insert(Credit), credits)
+    if genres:
+        db.execute(insert(Genre), genres)
+    db.commit()
+
+
+def sync_catalog(
+    db: Session,
+    root: Path = ARCHIVE_ROOT,
+    batch_size: int = BATCH_SIZE,
+    force: bool = False,
+    allow_empty: bool = False
+) -> SyncStats:
+    """
+    Bring the catalog tables in line with the archive on disk.
+
+    With force=True every metadata.json is re-read and rewritten even if
+    its mtime and hash match the stored row. Raises OSError if the archive
+    root cannot be listed, and RuntimeError, before deleting anything, if
+    the archive holds no works while the tables do, unless allow_empty=True.
+    """
+    stats = SyncStats()
+    stored: Dict[str, Tuple[int, str]] = {
+        work_id: (mtime_ns, digest)
+        for work_id, mtime_ns, digest in db.execute(
+            select(Work.id, Work.metadata_mtime_ns, Work.metadata_hash)
+        )
+    }
+
+    seen = set()
+    touched: List[dict] = []
+
+    def changed() -> Iterator[Tuple[_Found, dict, str]]:
+        for found in walk_archive(root):
+            stats.scanned += 1
+            seen.add(found.id)
+            previous = stored.get(found.id)
+            if not force and previous is not None and previous[0] == found.mtime_ns:
+                stats.unchanged += 1
+                continue
+
+            read = _read(found)
+            if read is None:
+                stats.failed += 1
+                continue
+            raw, digest = read
+            if not force and previous is not None and previous[1] == digest:
+                touched.append({"id": found.id, "metadata_mtime_ns": found.mtime_ns})
+                stats.touched += 1
+                continue
+
+            try:
+                metadata = json.loads(raw)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                stats.failed += 1
+                continue
+            if not isinstance(metadata, dict):
+                stats.failed += 1
+                continue
+            yield found, metadata, digest
+
+    for batch in _batches(changed(), batch_size):
+        _write_batch(db, batch)
+        stats.upserted += len(batch)
+
+    for batch in _batches(touched, batch_size):
+        db.execute(update(Work), batch)
+        db.commit()
+
+    if not seen and stored and not allow_empty:
+        raise RuntimeError(
+            f"No works found under {root}; refusing to delete {len(stored)} catalog rows "
+            "(pass allow_empty to empty the tables)"
+        )
+
+    removed = [work_id for work_id in stored if work_id not in seen]
+    for batch in _batches(removed, batch_size):
+        db.execute(delete(Credit).where(Credit.work_id.in_(batch)))
+        db.execute(delete(Genre).where(Genre.work_id.in_(batch)))
+        db.execute(delete(Work).where(Work.id.in_(batch)))
+        stats.removed += len(batch)
+
+    live_creators = {work_id.split("/", 1)[0] for work_id in seen}
+    db.execute(delete(CatalogCreator).where(CatalogCreator.id.not_in(live_creators)))
+    db.commit()
+    return stats
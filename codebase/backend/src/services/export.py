@@ -0,0 +1,122 @@
+"""
+Streaming NDJSON export of every work's metadata.
+
+Each line is one JSON object holding the work id, its creator and the full
+metadata.json document. Lines come from generators and are grouped into
+chunks of about CHUNK_BYTES, gzip-compressed on the fly when asked, so an
+export holds one chunk at a time however large the archive is: the API
+streams from the in-memory catalog, and database/export_catalog.py walks
+the archive reading one metadata.json at a time.
+
+since= keeps works whose last_updated (archived_date for works without
+one) is at or after a timestamp, for incremental pulls. Works carrying
+neither date are always exported, so a mirror never misses a change.
+"""
+
+import json
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+from services import metrics
+from services.catalog import WorkRecord
+from services.catalog_sync import walk_archive
+
+# Bytes of NDJSON gathered before a chunk is handed to the response or file
+CHUNK_BYTES = 64 * 1024
+
+GZIP_LEVEL = 6
+
+EXPORTED = metrics.counter("catalog_export_works_total", "Works written by catalog exports")
+
+# (work id, creator id, metadata.json document)
+Document = Tuple[str, str, dict]
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    # Archive timestamps carry no offset and are compared as UTC
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def parse_since(value: str) -> datetime:
+    """Parse a since= ISO 8601 date or datetime; raises ValueError"""
+    try:
+        return _naive_utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise ValueError(f"since must be an ISO 8601 date or datetime, not {value!r}")
+
+
+def updated_at(metadata: dict) -> Optional[datetime]:
+    """When a work was last changed, from last_updated or archived_date"""
+    for key in ('last_updated', 'archived_date'):
+        value = metadata.get(key)
+        if isinstance(value, str):
+            try:
+                return _naive_utc(datetime.fromisoformat(value))
+            except ValueError:
+                continue
+    return None
+
+
+def catalog_documents(records: Iterable[WorkRecord]) -> Iterator[Document]:
+    """Documents of catalog records, in work id order"""
+    for record in sorted(records, key=lambda record: record.id):
+        yield record.id, record.creator_id, record.metadata
+
+
+def archive_documents(root: Path) -> Iterator[Document]:
+    """Documents read straight from the archive, one metadata.json at a time"""
+    for found in walk_archive(root):
+        try:
+            with open(found.path, 'rb') as f:
+                metadata = json.loads(f.read())
+        except (OSError, ValueError):
+            continue
+        if isinstance(metadata, dict):
+            yield found.id, found.creator_id, metadata
+
+
+def ndjson_lines(documents: Iterable[Document], since: Optional[datetime] = None) -> Iterator[bytes]:
+    """One UTF-8 JSON line per document, skipping works last updated before since"""
+    for work_id, creator_id, metadata in documents:
+        if since is not None:
+            updated = updated_at(metadata)
+            if updated is not None and updated < since:
+                continue
+        line = {"id": work_id, "creatorId": creator_id, "metadata": metadata}
+        yield json.dumps(line, ensure_ascii=False).encode('utf-8') + b"\n"
+        EXPORTED.inc()
+
+
+def _chunked(lines: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    buffer = bytearray()
+    for line in lines:
+        buffer += line
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _gzipped(chunks: Iterable[bytes], level: int = GZIP_LEVEL) -> Iterator[bytes]:
+    # wbits 16 + MAX_WBITS writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(
+    documents: Iterable[Document],
+    since: Optional[datetime] = None,
+    compress: bool = False
+) -> Iterator[bytes]:
+    """The NDJSON export of documents as byte chunks, gzip-compressed if compress"""
+    chunks = _chunked(ndjson_lines(documents, since))
+    return _gzipped(chunks) if compress else chunks
@@ -0,0 +1,255 @@
+"""
+Line-level full-text index over lyrics.json.
+
+Each language version (ja, ja_romaji, en) of a work's lyrics is split into
+lines and every non-blank line is indexed with the same tokenizer as the
+search index: CJK character bigrams for Japanese and word tokens for romaji
+and English. A query matches the lines containing all of its tokens, so
+results carry the language, line number and a highlighted copy of each
+matching line without any lyrics file being opened per query.
+
+A work's lyrics are re-indexed when the catalog replaces its record,
+which the catalog does whenever the lyrics file's mtime or size changes.
+"""
+
+import html
+import json
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from services.catalog import Catalog, WorkRecord, catalog
+from services.profiling import phase
+from services.search_index import decode_cursor, encode_cursor, normalize, tokenize
+
+LANGUAGES = ("ja", "ja_romaji", "en")
+
+# Matching lines returned per work by default
+HITS_PER_WORK = 3
+
+_LATIN_TERM_RE = re.compile(r"[0-9a-z\u00c0-\u024f]+")
+_LATIN_CHAR = r"[0-9a-z\u00c0-\u024f]"
+
+
+@dataclass
+class LyricsHit:
+    """One matching line"""
+    lang: str
+    line: int  # 1-based line number within the language version
+    text: str
+    highlights: List[Tuple[int, int]]
+
+    @property
+    def snippet(self) -> str:
+        """The line, HTML-escaped, with matches wrapped in <mark>"""
+        parts = []
+        position = 0
+        for start, end in self.highlights:
+            parts.append(html.escape(self.text[position:start]))
+            parts.append(f"<mark>{html.escape(self.text[start:end])}</mark>")
+            position = end
+        parts.append(html.escape(self.text[position:]))
+        return "".join(parts)
+
+
+@dataclass
+class LyricsMatch:
+    """A work with at least one matching line"""
+    record: WorkRecord
+    matches: int
+    hits: List[LyricsHit] = field(default_factory=list)
+
+
+@dataclass
+class LyricsPage:
+    results: List[LyricsMatch]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def language_versions(text: str) -> Dict[str, str]:
+    """language_versions of a lyrics.json document; empty if it can't be parsed"""
+    with phase("json_parse"):
+        try:
+            document = json.loads(text)
+        except json.JSONDecodeError:
+            return {}
+    versions = document.get('language_versions') if isinstance(document, dict) else None
+    if not isinstance(versions, dict):
+        return {}
+    return {lang: versions[lang] for lang in LANGUAGES if isinstance(versions.get(lang), str)}
+
+
+def highlight(line: str, terms: Sequence[str]) -> List[Tuple[int, int]]:
+    """Merged (start, end) offsets in line of every occurrence of the query terms"""
+    # Match against the normalized line, mapping offsets back to the
+    # original. Marks that compose with the character before them (ｶﾞ -> ガ)
+    # are normalized together with it, as they are when the line is indexed.
+    clusters: List[Tuple[int, int]] = []
+    for index, char in enumerate(line):
+        folded_char = normalize(char)
+        if clusters and folded_char and unicodedata.combining(folded_char[0]):
+            clusters[-1] = (clusters[-1][0], index + 1)
+        else:
+            clusters.append((index, index + 1))
+    folded = []
+    origin = []
+    origin_end = []
+    for start, end in clusters:
+        normalized = normalize(line[start:end])
+        folded.append(normalized)
+        origin.extend([start] * len(normalized))
+        origin_end.extend([end] * len(normalized))
+    text = "".join(folded)
+
+    spans = []
+    for term in terms:
+        if _LATIN_TERM_RE.fullmatch(term):
+            pattern = f"(?<!{_LATIN_CHAR}){re.escape(term)}(?!{_LATIN_CHAR})"
+        else:
+            pattern = f"(?={re.escape(term)})"
+        for match in re.finditer(pattern, text):
+            start = match.start()
+            spans.append((origin[start], origin_end[start + len(term) - 1]))
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class LyricsIndex:
+    """Line postings over every work's lyrics, kept in step with the catalog generation"""
+
+    def __init__(self, source: Catalog):
+        self.catalog = source
+        self.generation = -1
+        self._lock = threading.Lock()
+        self._records: Dict[str, WorkRecord] = {}
+        # line id -> (work id, language, line number, text)
+        self._lines: Dict[int, Tuple[str, str, int, str]] = {}
+        self._doc_lines: Dict[str, List[int]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._line_terms: Dict[int, Tuple[str, ...]] = {}
+        self._next_line = 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def sync(self) -> None:
+        """Re-index the lyrics of works that changed since the last sync"""
+        self.catalog.refresh()
+        if self.catalog.generation == self.generation:
+            return
+
+        with self._lock, phase("index"):
+            generation = self.catalog.generation
+            if generation == self.generation:
+                return
+
+            current = {record.id: record for record in self.catalog.works()}
+            for work_id in list(self._records):
+                if work_id not in current:
+                    self._remove(work_id)
+            for work_id, record in current.items():
+                if self._records.get(work_id) is not record:
+                    self._remove(work_id)
+                    self._add(record)
+            self.generation = generation
+
+    def _add(self, record: WorkRecord) -> None:
+        self._records[record.id] = record
+        line_ids = self._doc_lines[record.id] = []
+        text = record.read_file(record.lyrics_file)
+        if text is None:
+            return
+
+        for lang, version in language_versions(text).items():
+            for number, line in enumerate(version.split("\n"), start=1):
+                line = line.strip()
+                terms = tuple(dict.fromkeys(tokenize(line, unigrams=True)))
+                if not terms:
+                    continue
+                line_id = self._next_line
+                self._next_line += 1
+                self._lines[line_id] = (record.id, lang, number, line)
+                self._line_terms[line_id] = terms
+                for term in terms:
+                    self._postings[term].add(line_id)
+                line_ids.append(line_id)
+
+    def _remove(self, work_id: str) -> None:
+        self._records.pop(work_id, None)
+        for line_id in self._doc_lines.pop(work_id, ()):
+            del self._lines[line_id]
+            for term in self._line_terms.pop(line_id):
+                lines = self._postings[term]
+                lines.discard(line_id)
+                if not lines:
+                    del self._postings[term]
+
+    def search(
+        self,
+        q: str,
+        lang: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        hits: int = HITS_PER_WORK
+    ) -> LyricsPage:
+        """
+        Works whose lyrics have lines containing every query token, those
+        with the most matching lines first.
+
+        Each result carries up to hits matching lines in language and line
+        order. Raises ValueError for a cursor not issued by this method.
+        """
+        self.sync()
+        terms = list(dict.fromkeys(tokenize(q))) if q and q.strip() else []
+        after = decode_cursor(cursor, 'l') if cursor else None
+        if not terms:
+            return LyricsPage(results=[], total=0)
+
+        with self._lock, phase("index"):
+            postings = [self._postings.get(term) for term in terms]
+            if not all(postings):
+                return LyricsPage(results=[], total=0)
+            postings.sort(key=len)
+            matched = set(postings[0])
+            for lines in postings[1:]:
+                matched.intersection_update(lines)
+
+            by_work: Dict[str, List[int]] = defaultdict(list)
+            for line_id in matched:
+                work_id, line_lang = self._lines[line_id][:2]
+                if lang is None or line_lang == lang:
+                    by_work[work_id].append(line_id)
+
+            keys = sorted((-len(line_ids), work_id) for work_id, line_ids in by_work.items())
+            if after is not None:
+                keys = [key for key in keys if key > after]
+            page = keys if limit is None else keys[:limit]
+            next_cursor = None
+            if limit is not None and len(keys) > limit:
+                next_cursor = encode_cursor('l', page[-1])
+
+            results = []
+            for count, work_id in page:
+                line_ids = sorted(
+                    by_work[work_id],
+                    key=lambda line_id: (LANGUAGES.index(self._lines[line_id][1]), self._lines[line_id][2])
+                )
+                match = LyricsMatch(record=self._records[work_id], matches=-count)
+                for line_id in line_ids[:hits]:
+                    _, line_lang, number, text = self._lines[line_id]
+                    match.hits.append(LyricsHit(line_lang, number, text, highlight(text, terms)))
+                results.append(match)
+            return LyricsPage(results=results, total=len(by_work), next_cursor=next_cursor)
+
+
+lyrics_index = LyricsIndex(catalog)
@@ -0,0 +1,307 @@
+"""
+Opt-in request profiling.
+
+ProfilingMiddleware profiles a random PROFILE_SAMPLE_RATE fraction of
+requests, plus any request sending an X-Profile header when PROFILE_HEADER
+is enabled. A profiled request records:
+
+- wall and CPU time per phase (filesystem, json_parse, validation,
+  serialization, ...) from phase() blocks placed around the expensive steps.
+  Phases are exclusive: time spent in a nested phase is charged to the inner
+  one only. CPU time is per thread, so it excludes other requests.
+- a statistical profile: a sampler thread snapshots, every
+  PROFILE_INTERVAL_MS, the stacks of the threads that are inside one of the
+  request's phases at that moment and counts each collapsed stack (the
+  flamegraph.pl / speedscope "folded" format). The event loop and the
+  worker threads are shared with other requests, so time outside a phase
+  is not sampled.
+
+Profiles are written as JSON to PROFILE_DIR, which keeps the newest
+PROFILE_KEEP files, or returned in place of the response body with
+X-Profile: inline. Every profiled response carries a Server-Timing header
+with the phase split.
+
+When profiling is off, phase() is a context variable lookup returning a
+shared no-op context manager.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import anyio.to_thread
+
+from services.metrics import route_template
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = Path(os.getenv(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "lob-profiles")
+))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+
+PROFILE_HEADER = b"x-profile"
+
+# Deepest stack kept per sample; deeper frames are cut at the root end
+MAX_STACK_DEPTH = 64
+
+ENABLED = PROFILE_SAMPLE_RATE > 0 or PROFILE_HEADER_ENABLED
+
+_current: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+
+class ProfileSession:
+    """Phase timings of one profiled request and the threads inside its phases"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = datetime.now(timezone.utc)
+        # phase name -> [wall seconds, cpu seconds]
+        self.phases: Dict[str, List[float]] = {}
+        # thread id -> stack of [phase name, wall start, cpu start]
+        self._stacks: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def _charge(self, frame: list, wall: float, cpu: float) -> None:
+        with self._lock:
+            totals = self.phases.setdefault(frame[0], [0.0, 0.0])
+            totals[0] += wall - frame[1]
+            totals[1] += cpu - frame[2]
+
+    def enter(self, name: str) -> None:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        thread = threading.get_ident()
+        stack = self._stacks.setdefault(thread, [])
+        if stack:
+            # Pause the enclosing phase
+            self._charge(stack[-1], wall, cpu)
+        stack.append([name, wall, cpu])
+
+    def exit(self) -> None:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        stack = self._stacks[threading.get_ident()]
+        self._charge(stack.pop(), wall, cpu)
+        if stack:
+            stack[-1][1], stack[-1][2] = wall, cpu
+
+    def active_threads(self) -> List[int]:
+        """Threads currently inside one of this request's phases"""
+        return [thread for thread, stack in list(self._stacks.items()) if stack]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            items = sorted(self.phases.items(), key=lambda item: -item[1][0])
+        return {
+            name: {"wall_ms": round(wall * 1000, 3), "cpu_ms": round(cpu * 1000, 3)}
+            for name, (wall, cpu) in items
+        }
+
+    def server_timing(self) -> str:
+        parts = [
+            f"{name};dur={timing['wall_ms']}"
+            for name, timing in self.summary().items()
+        ]
+        parts.append(f"total;dur={round((time.perf_counter() - self.started) * 1000, 3)}")
+        return ", ".join(parts)
+
+
+class _Phase:
+    __slots__ = ("session", "name")
+
+    def __init__(self, session: ProfileSession, name: str):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.session.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.session.exit()
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name: str):
+    """Context manager charging its block to a phase of the current profile, if any"""
+    session = _current.get()
+    if session is None:
+        return _NULL_PHASE
+    return _Phase(session, name)
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Counts the collapsed stacks of a session's active threads at a fixed interval"""
+
+    def __init__(self, session: ProfileSession, interval: float = PROFILE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.session = session
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            active = self.session.active_threads()
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread in active:
+                frame = frames.get(thread)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def _rotate(directory: Path, keep: int) -> None:
+    profiles = sorted(directory.glob("*.json"))
+    for old in profiles[:max(0, len(profiles) - keep)]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+
+
+def write_profile(profile: dict, directory: Path = PROFILE_DIR, keep: int = PROFILE_KEEP) -> Path:
+    """Write a profile to the rotating profile directory and return its path"""
+    directory.mkdir(parents=True, exist_ok=True)
+    route = profile["route"].strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = directory / f"{stamp}-{profile['method']}-{route}.json"
+    path.write_text(json.dumps(profile, ensure_ascii=False, indent=1), encoding='utf-8')
+    _rotate(directory, keep)
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling sampled requests.
+
+    X-Profile: inline replaces the response body with the profile itself;
+    any other X-Profile value, or random sampling, writes it to PROFILE_DIR.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        header_enabled: bool = PROFILE_HEADER_ENABLED
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header_enabled = header_enabled
+
+    def _mode(self, scope) -> Optional[str]:
+        if self.header_enabled:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return "inline" if value.strip().lower() == b"inline" else "file"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "file"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self._mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession()
+        sampler = StackSampler(session)
+        status = 500
+        buffered = []
+
+        async def send_profiled(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", session.server_timing().encode("latin-1"))
+                    ]
+                }
+            if mode == "inline":
+                buffered.append(message)
+            else:
+                await send(message)
+
+        token = _current.set(session)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            # Joining the sampler and writing the file block, so both run
+            # on a worker thread rather than stalling the event loop
+            samples = await anyio.to_thread.run_sync(sampler.stop)
+            _current.reset(token)
+            profile = self._profile(scope, session, samples, status)
+            if mode == "file":
+                await anyio.to_thread.run_sync(write_profile, profile)
+
+        if mode == "inline":
+            body = json.dumps(profile, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"server-timing", session.server_timing().encode("latin-1")),
+                ]
+            })
+            await send({"type": "http.response.body", "body": body})
+
+    def _profile(self, scope, session: ProfileSession, samples: Counter, status: int) -> dict:
+        wall = time.perf_counter() - session.started
+        phases = session.summary()
+        return {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "route": route_template(scope),
+            "status": status,
+            "started": session.started_at.isoformat(),
+            "wall_ms": round(wall * 1000, 3),
+            "phases": phases,
+            "unattributed_wall_ms": round(wall * 1000 - sum(p["wall_ms"] for p in phases.values()), 3),
+            "sample_interval_ms": PROFILE_INTERVAL * 1000,
+            "samples": [
+                {"stack": stack, "count": count}
+                for stack, count in samples.most_common()
+            ],
+        }
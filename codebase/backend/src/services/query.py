@@ -0,0 +1,243 @@
+"""
+Boolean search query language.
+
+    composer:"TAKU INOUE" AND year:2020..2023 NOT type:cover
+    (genre:rock OR genre:pop) -type:cover 彗星
+
+A query is a sequence of clauses joined by AND (the default between
+adjacent clauses), OR and NOT, with parentheses for grouping; AND binds
+tighter than OR. A clause is either field:value, field:low..high for
+ranges (either end may be left open), or bare text. Operators must be
+written in capitals; lowercase "and" is an ordinary word. A leading "-"
+is shorthand for NOT. Values and text containing spaces are quoted.
+Parentheses and NOTs nest at most MAX_DEPTH deep.
+
+Field names come from a fixed list (FIELDS), so whether a query parses
+never depends on the archive's contents. Any other word followed by a
+colon, such as Re:Zero, is ordinary text.
+
+parse_query() only builds the syntax tree. The search index resolves each
+clause to a bitset over its document numbers (a Python int with bit n set
+for document n), so AND, OR and NOT are single big-integer operations
+however many works match.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+# Credit roles a clause can be scoped to, as written in metadata.json
+# credits; credit:name matches a name under any role, listed here or not
+CREDIT_ROLES = (
+    'artist', 'composer', 'lyricist', 'arranger', 'producer', 'mixing', 'mastering',
+    'illustration', 'video_direction', 'video_director', 'editor', 'colorist', 'cast',
+    'production_company', 'production_manager', 'timelapse_photography'
+)
+
+# Every field a clause may name
+FIELDS = frozenset((
+    'title', 'creator', 'type', 'genre', 'theme', 'year', 'era', 'platform', 'date', 'credit',
+    *CREDIT_ROLES
+))
+
+# Fields that accept low..high ranges
+RANGE_FIELDS = ('year', 'date')
+
+# Most parentheses and NOTs a clause may be nested in; bounds the recursion
+# of the parser and of everything that walks the tree
+MAX_DEPTH = 64
+
+_LEXER_RE = re.compile(r'''
+    \s*(?:
+        (?P<open>\() | (?P<close>\)) | (?P<minus>-(?=[^\s)]))
+      | (?P<field>[A-Za-z_]+):(?=\S)
+      | "(?P<quoted>[^"]*)"
+      | (?P<word>[^\s()"]+)
+    )
+''', re.VERBOSE)
+
+# Lexes a word-colon token whose name is not one of FIELDS as a plain word
+_WORD_RE = re.compile(r'\s*(?P<word>[^\s()"]+)')
+
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+@dataclass(frozen=True)
+class Text:
+    """Bare or quoted text, matched against the full-text index"""
+    text: str
+
+
+@dataclass(frozen=True)
+class Match:
+    """field:value"""
+    field: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Range:
+    """field:low..high; None leaves that end open"""
+    field: str
+    low: Optional[str]
+    high: Optional[str]
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    operands: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    operands: Tuple["Node", ...]
+
+
+Node = Union[Text, Match, Range, Not, And, Or]
+
+
+def _lex(query: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    while position < len(query):
+        if query[position:].isspace():
+            break
+        match = _LEXER_RE.match(query, position)
+        if match is None:
+            if query[position:].lstrip().startswith('"'):
+                raise ValueError("Unterminated quote in query")
+            raise ValueError(f"Unexpected character in query at position {position}")
+        kind = match.lastgroup
+        if kind == 'field' and match.group(kind).lower() not in FIELDS:
+            match = _WORD_RE.match(query, position)
+            kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'word' and value in _OPERATORS:
+            kind = value
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, str]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self.disjunction()
+        if self.peek() is not None:
+            raise ValueError("Unbalanced parenthesis in query")
+        return node
+
+    def disjunction(self) -> Node:
+        operands = [self.conjunction()]
+        while self.peek() == 'OR':
+            self.take()
+            operands.append(self.conjunction())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def conjunction(self) -> Node:
+        operands = [self.unary()]
+        while self.peek() not in (None, 'OR', 'close'):
+            if self.peek() == 'AND':
+                self.take()
+            operands.append(self.unary())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def nested(self, parse) -> Node:
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ValueError(f"Query nests parentheses and NOT more than {MAX_DEPTH} deep")
+        try:
+            return parse()
+        finally:
+            self.depth -= 1
+
+    def unary(self) -> Node:
+        kind = self.peek()
+        if kind in ('NOT', 'minus'):
+            self.take()
+            return Not(self.nested(self.unary))
+        if kind == 'open':
+            self.take()
+            node = self.nested(self.disjunction)
+            if self.peek() != 'close':
+                raise ValueError("Unbalanced parenthesis in query")
+            self.take()
+            return node
+        if kind == 'field':
+            field = self.take()[1].lower()
+            if self.peek() not in ('quoted', 'word'):
+                raise ValueError(f"Missing value for {field}:")
+            quoted, value = self.take()
+            if quoted == 'word' and '..' in value:
+                low, high = value.split('..', 1)
+                if field not in RANGE_FIELDS:
+                    raise ValueError(f"Ranges are only supported for {', '.join(RANGE_FIELDS)}")
+                return Range(field, low or None, high or None)
+            return Match(field, value)
+        if kind in ('quoted', 'word'):
+            return Text(self.take()[1])
+        if kind is None:
+            raise ValueError("Query ends where a term was expected")
+        raise ValueError(f"Unexpected {self.take()[1]!r} in query")
+
+
+def parse_query(query: str) -> Node:
+    """Syntax tree of a query; raises ValueError if it does not parse"""
+    tokens = _lex(query)
+    if not tokens:
+        raise ValueError("Empty query")
+    return _Parser(tokens).parse()
+
+
+def positive_text(node: Node) -> List[str]:
+    """Text clauses that are not negated, used to rank the matches"""
+    if isinstance(node, Text):
+        return [node.text]
+    if isinstance(node, (And, Or)):
+        return [text for operand in node.operands for text in positive_text(operand)]
+    return []
+
+
+def to_bitset(docs: Iterable[int]) -> int:
+    """Bitset with bit n set for every document number n"""
+    docs = list(docs)
+    if not docs:
+        return 0
+    buffer = bytearray(max(docs) // 8 + 1)
+    for doc in docs:
+        buffer[doc >> 3] |= 1 << (doc & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+# Set bit positions of every byte value
+_BYTE_BITS: Sequence[Tuple[int, ...]] = [
+    tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)
+]
+
+
+def bitset_docs(bits: int) -> List[int]:
+    """Document numbers set in a bitset, in ascending order"""
+    docs = []
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        if byte:
+            base = index * 8
+            docs.extend(base + bit for bit in _BYTE_BITS[byte])
+    return docs
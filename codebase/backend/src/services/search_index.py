@@ -0,0 +1,744 @@
+"""
+Inverted full-text index over the archive catalog.
+
+Latin text is split into lowercase word tokens; Japanese (and other CJK)
+text is split into overlapping character bigrams so titles like 彗星 or
+もうどうなってもいいや match without a morphological analyzer. Queries are
+answered from postings lists and ranked with BM25.
+
+Fuzzy queries use a second, trigram index over titles and their kana
+romanizations, so "stelar stelar" or "michidure" still find their works.
+Candidates are pruned to works sharing one of the query's rarest trigrams
+before any similarity is computed.
+
+Structured filters are served from the same index: a facet value -> work
+postings map (creator, type, genre, theme, year, era, platform) and a
+listing array kept sorted by (release date, work id) so date ranges are a
+bisect away. The same postings give per-value counts for any query's
+matches. Results are paged with opaque keyset cursors over that sort key
+(or over BM25 score for text and fuzzy queries), so a page never
+materializes more than limit + 1 records.
+
+Boolean queries (services.query) are evaluated over the same postings,
+title-only postings and credit names by role, each turned into a bitset
+over document numbers so AND, OR and NOT are big-integer operations.
+Bitsets are cached until the next catalog change.
+"""
+
+import base64
+import heapq
+import json
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from services import metrics
+from services.catalog import UNDATED, Catalog, WorkRecord, catalog
+from services.profiling import phase
+from services.query import (
+    And, Match, Node, Not, Or, Range, Text, bitset_docs, parse_query, positive_text, to_bitset
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Field weights applied to term frequencies (a light BM25F)
+TITLE_WEIGHT = 3.0
+TEXT_WEIGHT = 1.0
+
+# Facets a work is indexed under, in the order facet counts are reported
+FACET_FIELDS = ('creator', 'type', 'genre', 'theme', 'year', 'era', 'platform')
+
+# Facets with at most 1/this as many values as there are matched works are
+# counted by intersecting each value's postings with the matches
+FACET_PROBE_RATIO = 8
+
+# Fuzzy matches must share at least this fraction of the query's trigrams
+FUZZY_THRESHOLD = 0.4
+
+_TOKEN_RE = re.compile(
+    r"(?P<latin>[0-9a-z\u00c0-\u024f]+)"
+    r"|(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff66-\uff9f]+)"
+)
+
+
+def normalize(text: str) -> str:
+    """NFKC-fold and lowercase text so full-width and half-width forms match"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """
+    Split text into Latin word tokens and CJK character bigrams.
+
+    With unigrams=True every CJK character is emitted as well, which lets
+    one-character queries such as 星 match indexed documents.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(normalize(text)):
+        word = match.group("latin")
+        if word is not None:
+            tokens.append(word)
+            continue
+        run = match.group("cjk")
+        if len(run) == 1 or unigrams:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+# Hepburn readings of hiragana; katakana is folded onto hiragana first
+_KANA = dict(zip(
+    "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+    "がぎぐげござじずぜぞだぢづでどばびぶべぼぱぴぷぺぽぁぃぅぇぉゔ",
+    "a i u e o ka ki ku ke ko sa shi su se so ta chi tsu te to na ni nu ne no "
+    "ha hi fu he ho ma mi mu me mo ya yu yo ra ri ru re ro wa wo n "
+    "ga gi gu ge go za ji zu ze zo da ji zu de do ba bi bu be bo pa pi pu pe po "
+    "a i u e o vu".split()
+))
+_SMALL_Y = {"ゃ": "a", "ゅ": "u", "ょ": "o"}
+
+
+def romanize_kana(text: str) -> str:
+    """
+    Transliterate hiragana and katakana to Hepburn romaji, leaving other
+    characters as they are, so みちづれ can be found by typing michizure.
+    """
+    chars = [
+        chr(ord(char) - 0x60) if "\u30a1" <= char <= "\u30f4" else char
+        for char in text
+    ]
+    out: List[str] = []
+    geminate = False
+    for char in chars:
+        if char == "っ":
+            geminate = True
+            continue
+        if char in _SMALL_Y and out and out[-1].endswith("i") and len(out[-1]) > 1:
+            # き + ゃ -> kya, し + ゃ -> sha
+            stem = out.pop()[:-1]
+            out.append(stem + ("" if stem in ("sh", "ch", "j") else "y") + _SMALL_Y[char])
+            continue
+        if char == "ー":
+            if out and out[-1]:
+                out.append(out[-1][-1])
+            continue
+        reading = _KANA.get(char)
+        if reading is None:
+            out.append(char)
+            geminate = False
+            continue
+        if geminate:
+            reading = reading[0] + reading
+            geminate = False
+        out.append(reading)
+    return "".join(out)
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Character trigrams of each word, padded like pg_trgm ("  s", " st",
+    ..., "ar ") so word starts and ends carry weight.
+    """
+    grams = set()
+    for match in _TOKEN_RE.finditer(normalize(text)):
+        padded = "  " + match.group() + " "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _strings(value) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def _dict(metadata: dict, key: str) -> dict:
+    value = metadata.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def titles(record: WorkRecord) -> List[str]:
+    """The work's title, native title and romanized title, where set"""
+    metadata = record.metadata
+    values = [metadata.get('title'), metadata.get('title_native'), metadata.get('title_romanized')]
+    return [text for text in values if isinstance(text, str) and text]
+
+
+def indexed_fields(record: WorkRecord) -> List[Tuple[float, str]]:
+    """Text of a work to index, paired with its field weight"""
+    metadata = record.metadata
+    classification = _dict(metadata, 'classification')
+    related = _dict(metadata, 'related_works')
+    preservation = _dict(metadata, 'preservation')
+
+    texts = [
+        record.song.artist,
+        record.song.description,
+        related.get('album'),
+        related.get('era'),
+        preservation.get('why_archived'),
+        *_strings(_dict(metadata, 'credits')),
+        *_strings(classification.get('genre')),
+        *_strings(classification.get('themes')),
+        *_strings(classification.get('emotional_tags')),
+    ]
+
+    fields = [(TITLE_WEIGHT, text) for text in titles(record)]
+    fields += [(TEXT_WEIGHT, text) for text in texts if isinstance(text, str) and text]
+    return fields
+
+
+def fuzzy_fields(record: WorkRecord) -> List[str]:
+    """Titles and romanizations matched by fuzzy search"""
+    texts = titles(record)
+    romanized = [romanize_kana(text) for text in texts]
+    return list(dict.fromkeys(texts + romanized))
+
+
+def credit_names(record: WorkRecord) -> Dict[str, List[str]]:
+    """Credited names of a work by role ("composer", "lyricist", ...)"""
+    names: Dict[str, List[str]] = {}
+    for role, value in _dict(record.metadata, 'credits').items():
+        for text in _strings(value):
+            names.setdefault(role.lower(), []).extend(name.strip() for name in text.split(",") if name.strip())
+    return names
+
+
+def facet_values(record: WorkRecord) -> Dict[str, List[str]]:
+    """Facet values of a work as displayed, by facet name; the index keys them normalized"""
+    metadata = record.metadata
+    classification = _dict(metadata, 'classification')
+    release_date = record.song.Release_date or ''
+    era = _dict(metadata, 'related_works').get('era')
+    platform = _dict(metadata, 'source').get('platform')
+    return {
+        'creator': [record.creator_id],
+        'type': [metadata.get('type') or 'song'],
+        'genre': [genre for genre in _strings(classification.get('genre')) if genre.strip()],
+        'theme': [theme for theme in _strings(classification.get('themes')) if theme.strip()],
+        'year': [release_date[:4]] if release_date[:4].isdigit() else [],
+        'era': [era] if isinstance(era, str) and era.strip() else [],
+        'platform': [platform] if isinstance(platform, str) and platform.strip() else [],
+    }
+
+
+@dataclass
+class SearchPage:
+    """One page of search results"""
+    records: List[WorkRecord]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(kind: str, key: tuple) -> str:
+    """Pack a sort key into an opaque URL-safe cursor"""
+    raw = json.dumps([kind, *key], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, kind: str) -> tuple:
+    """Unpack a cursor made by encode_cursor; raises ValueError if it is not one of ours"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Malformed cursor") from e
+
+    if not isinstance(value, list) or len(value) != 3 or value[0] != kind:
+        raise ValueError("Cursor does not belong to this query")
+    first, work_id = value[1], value[2]
+    expected = (int, float) if kind in ('r', 'f', 'l') else str
+    if not isinstance(first, expected) or isinstance(first, bool) or not isinstance(work_id, str):
+        raise ValueError("Malformed cursor")
+    return (first, work_id)
+
+
+def _by_count(item: Tuple[str, int]) -> tuple:
+    return (-item[1], item[0])
+
+
+class SearchIndex:
+    """BM25-ranked inverted index, kept in step with the catalog generation"""
+
+    def __init__(self, source: Catalog):
+        self.catalog = source
+        self.generation = -1
+        self._lock = threading.Lock()
+        self._doc_ids: Dict[str, int] = {}
+        self._records: Dict[int, WorkRecord] = {}
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._doc_len: Dict[int, float] = {}
+        self._total_len = 0.0
+        # Terms of the title fields alone, for title: clauses
+        self._titles: Dict[str, Set[int]] = defaultdict(set)
+        self._doc_titles: Dict[int, Set[str]] = {}
+        self._facets: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self._doc_facets: Dict[int, Dict[str, List[str]]] = {}
+        self._facet_labels: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # role -> normalized name -> docs; role "" holds every role
+        self._credits: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self._doc_credits: Dict[int, List[Tuple[str, str]]] = {}
+        self._bitsets: Dict[tuple, int] = {}
+        self._doc_key: Dict[int, Tuple[str, str]] = {}
+        self._grams: Dict[str, Set[int]] = defaultdict(set)
+        self._doc_grams: Dict[int, Set[str]] = {}
+        self._listing_keys: List[Tuple[str, str]] = []
+        self._listing_docs: List[int] = []
+        self._dated = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def sync(self) -> None:
+        """Apply catalog changes since the last sync, re-indexing only changed works"""
+        self.catalog.refresh()
+        if self.catalog.generation == self.generation:
+            return
+
+        with self._lock, phase("index"):
+            generation = self.catalog.generation
+            if generation == self.generation:
+                return
+
+            current = {record.id: record for record in self.catalog.works()}
+            for work_id, doc in list(self._doc_ids.items()):
+                if work_id not in current and doc in self._records:
+                    self._remove(doc)
+            for work_id, record in current.items():
+                doc = self._doc_ids.setdefault(work_id, len(self._doc_ids))
+                if self._records.get(doc) is not record:
+                    self._remove(doc)
+                    self._add(doc, record)
+            self._sort_listing()
+            self._bitsets.clear()
+            self.generation = generation
+
+    def _add(self, doc: int, record: WorkRecord) -> None:
+        frequencies: Dict[str, float] = defaultdict(float)
+        for weight, text in indexed_fields(record):
+            for token in tokenize(text, unigrams=True):
+                frequencies[token] += weight
+
+        for term, tf in frequencies.items():
+            self._postings[term][doc] = tf
+        length = sum(frequencies.values())
+        self._records[doc] = record
+        self._doc_terms[doc] = tuple(frequencies)
+        self._doc_len[doc] = length
+        self._total_len += length
+
+        title_terms = {token for text in titles(record) for token in tokenize(text, unigrams=True)}
+        for term in title_terms:
+            self._titles[term].add(doc)
+        self._doc_titles[doc] = title_terms
+
+        facets: Dict[str, List[str]] = {}
+        for field, labels in facet_values(record).items():
+            values = facets[field] = []
+            for label in labels:
+                value = normalize(label.strip())
+                if value not in values:
+                    values.append(value)
+                    self._facets[field][value].add(doc)
+                    self._facet_labels[field].setdefault(value, label.strip())
+        self._doc_facets[doc] = facets
+
+        credits = []
+        for role, names in credit_names(record).items():
+            for name in names:
+                for key in ((role, normalize(name)), ("", normalize(name))):
+                    if key not in credits:
+                        credits.append(key)
+                        self._credits[key[0]][key[1]].add(doc)
+        self._doc_credits[doc] = credits
+
+        self._doc_key[doc] = record.release_key
+
+        grams = set().union(*(trigrams(text) for text in fuzzy_fields(record)))
+        for gram in grams:
+            self._grams[gram].add(doc)
+        self._doc_grams[doc] = grams
+
+    def _remove(self, doc: int) -> None:
+        if self._records.pop(doc, None) is None:
+            return
+        for term in self._doc_terms.pop(doc):
+            postings = self._postings[term]
+            postings.pop(doc, None)
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc)
+        for term in self._doc_titles.pop(doc):
+            docs = self._titles[term]
+            docs.discard(doc)
+            if not docs:
+                del self._titles[term]
+
+        for field, values in self._doc_facets.pop(doc).items():
+            for value in values:
+                docs = self._facets[field][value]
+                docs.discard(doc)
+                if not docs:
+                    del self._facets[field][value]
+                    del self._facet_labels[field][value]
+        for role, name in self._doc_credits.pop(doc):
+            docs = self._credits[role][name]
+            docs.discard(doc)
+            if not docs:
+                del self._credits[role][name]
+                if not self._credits[role]:
+                    del self._credits[role]
+        del self._doc_key[doc]
+
+        for gram in self._doc_grams.pop(doc):
+            docs = self._grams[gram]
+            docs.discard(doc)
+            if not docs:
+                del self._grams[gram]
+
+    def _sort_listing(self) -> None:
+        ordered = sorted(self._doc_key.items(), key=lambda item: item[1])
+        self._listing_keys = [key for _, key in ordered]
+        self._listing_docs = [doc for doc, _ in ordered]
+        self._dated = bisect_left(self._listing_keys, (UNDATED,))
+
+    def _date_slice(self, date_from: Optional[str], date_to: Optional[str]) -> Tuple[int, int]:
+        """Listing positions of the works released between two dates, inclusive"""
+        keys = self._listing_keys
+        lo = bisect_left(keys, (date_from,), 0, self._dated) if date_from else 0
+        # A partial dateTo such as "2021" or "2021-07" covers the whole period
+        hi = bisect_right(keys, (date_to + "\uffff",), 0, self._dated) if date_to else self._dated
+        return lo, hi
+
+    def _filter(
+        self,
+        facets: Dict[str, Optional[str]],
+        date_from: Optional[str],
+        date_to: Optional[str]
+    ) -> Optional[Set[int]]:
+        """Intersect facet postings and the release-date slice; None means unfiltered"""
+        matches: List[Iterable[int]] = []
+        for field, value in facets.items():
+            if value:
+                matches.append(self._facets[field].get(normalize(value), set()))
+
+        if date_from or date_to:
+            lo, hi = self._date_slice(date_from, date_to)
+            matches.append(self._listing_docs[lo:hi])
+
+        if not matches:
+            return None
+        matches.sort(key=len)
+        selected = set(matches[0])
+        for docs in matches[1:]:
+            selected.intersection_update(docs)
+        return selected
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        creator: Optional[str] = None,
+        type: Optional[str] = None,
+        genre: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fuzzy: bool = False,
+        theme: Optional[str] = None,
+        year: Optional[str] = None,
+        era: Optional[str] = None,
+        platform: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> SearchPage:
+        """
+        Return one page of works matching the query text and filters.
+
+        With q, only works containing every query token are returned, best
+        BM25 score first; otherwise works are listed by release date. With
+        fuzzy=True, q is instead matched by trigram similarity against
+        titles and their romanizations, which tolerates misspellings. query
+        is a boolean query (see services.query) the results must also
+        match; without q, its text ranks the results. Ties are broken by
+        work id so the order is stable between calls. Raises ValueError for
+        a query that does not parse or a cursor that was not issued for
+        this kind of query.
+        """
+        self.sync()
+        kind, terms, grams = self._parse(q, fuzzy)
+        node = parse_query(query) if query is not None else None
+        # Without q, text inside the query ranks the works the query matched
+        rank_query = kind == 'd' and node is not None
+        if rank_query:
+            terms = list(dict.fromkeys(
+                token for text in positive_text(node) for token in tokenize(text)
+            ))
+            kind = 'r' if terms else 'd'
+        after = decode_cursor(cursor, kind) if cursor else None
+        if kind is None:
+            return SearchPage(records=[], total=0)
+
+        filters = {
+            'creator': creator, 'type': type, 'genre': genre,
+            'theme': theme, 'year': year, 'era': era, 'platform': platform,
+        }
+        with self._lock, phase("index"):
+            allowed = self._filter(filters, date_from, date_to)
+            if node is not None:
+                allowed = self._select(node, allowed)
+            if kind == 'r':
+                scores = self._score(terms, allowed, every=not rank_query)
+            elif kind == 'f':
+                scores = self._fuzzy_score(grams, allowed)
+            if kind != 'd':
+                total = len(scores)
+                keys = ((-score, self._records[doc].id, doc) for doc, score in scores.items())
+            else:
+                total = len(self._records) if allowed is None else len(allowed)
+                keys = self._listing(allowed, after)
+
+            if after is not None:
+                keys = (key for key in keys if key[:2] > after)
+            if limit is None:
+                page = sorted(keys)
+            elif kind != 'd' or allowed is not None:
+                page = heapq.nsmallest(limit + 1, keys)
+            else:
+                # The unfiltered listing is already in order
+                page = [key for _, key in zip(range(limit + 1), keys)]
+
+            next_cursor = None
+            if limit is not None and len(page) > limit:
+                page = page[:limit]
+                next_cursor = encode_cursor(kind, page[-1][:2])
+            return SearchPage(
+                records=[self._records[key[-1]] for key in page],
+                total=total,
+                next_cursor=next_cursor
+            )
+
+    def facet_counts(
+        self,
+        q: Optional[str] = None,
+        fuzzy: bool = False,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        fields: Sequence[str] = FACET_FIELDS,
+        size: Optional[int] = None,
+        query: Optional[str] = None
+    ) -> Tuple[int, Dict[str, List[Tuple[str, int]]]]:
+        """
+        Number of matching works per facet value, for the same query and
+        filters search() accepts.
+
+        Returns the total number of matches and, per requested field, up to
+        size (value, count) pairs, most frequent first.
+        """
+        self.sync()
+        kind, terms, grams = self._parse(q, fuzzy)
+        node = parse_query(query) if query is not None else None
+        if kind is None:
+            return 0, {field: [] for field in fields}
+
+        with self._lock, phase("index"):
+            matched = self._filter(filters or {}, date_from, date_to)
+            if node is not None:
+                matched = self._select(node, matched)
+            if kind != 'd':
+                scores = self._score(terms, matched) if terms else self._fuzzy_score(grams, matched)
+                matched = set(scores)
+            total = len(self._records) if matched is None else len(matched)
+
+            counts = {}
+            for field in fields:
+                tally = self._count(field, matched)
+                top = heapq.nsmallest(size, tally, key=_by_count) if size else sorted(tally, key=_by_count)
+                labels = self._facet_labels[field]
+                counts[field] = [(labels[value], count) for value, count in top]
+            return total, counts
+
+    def _count(self, field: str, matched: Optional[Set[int]]) -> List[Tuple[str, int]]:
+        """(value, count) of one facet over the matched works; None means every work"""
+        postings = self._facets.get(field, {})
+        if matched is None:
+            return [(value, len(docs)) for value, docs in postings.items()]
+        if len(postings) * FACET_PROBE_RATIO <= len(matched):
+            # Few distinct values: intersect each value's postings with the
+            # matches (set intersection walks the smaller of the two)
+            counts = ((value, len(docs & matched)) for value, docs in postings.items())
+        else:
+            # Many values, small result: walk the matched works' own values
+            tally: Dict[str, int] = defaultdict(int)
+            for doc in matched:
+                for value in self._doc_facets[doc].get(field, ()):
+                    tally[value] += 1
+            counts = tally.items()
+        return [(value, count) for value, count in counts if count]
+
+    def _select(self, node: Node, allowed: Optional[Set[int]]) -> Set[int]:
+        """The allowed works (every work if None) matching a boolean query"""
+        docs = set(bitset_docs(self._evaluate(node)))
+        return docs if allowed is None else docs & allowed
+
+    def _evaluate(self, node: Node) -> int:
+        """Bitset of the works matching a boolean query node"""
+        if isinstance(node, And):
+            bits = self._evaluate(node.operands[0])
+            for operand in node.operands[1:]:
+                if not bits:
+                    break
+                bits &= self._evaluate(operand)
+            return bits
+        if isinstance(node, Or):
+            bits = 0
+            for operand in node.operands:
+                bits |= self._evaluate(operand)
+            return bits
+        if isinstance(node, Not):
+            return self._bitset(('all',), lambda: self._records) & ~self._evaluate(node.operand)
+        if isinstance(node, Text):
+            return self._text_bits('text', node.text, self._postings)
+        if isinstance(node, Range):
+            return self._date_bits(node.field, node.low, node.high)
+        return self._match_bits(node)
+
+    def _text_bits(self, scope: str, text: str, postings: Dict[str, Iterable[int]]) -> int:
+        """Works whose postings hold every token of text"""
+        bits = None
+        for term in dict.fromkeys(tokenize(text)):
+            term_bits = self._bitset((scope, term), lambda: postings.get(term, ()))
+            bits = term_bits if bits is None else bits & term_bits
+        return bits or 0
+
+    def _match_bits(self, node: Match) -> int:
+        field, value = node.field, normalize(node.value.strip())
+        if field in FACET_FIELDS:
+            return self._bitset((field, value), lambda: self._facets[field].get(value, ()))
+        if field == 'date':
+            return self._date_bits(field, node.value, node.value)
+        if field == 'title':
+            return self._text_bits('title', node.value, self._titles)
+        # A role no work is credited with yet simply matches nothing
+        role = "" if field == 'credit' else field
+        return self._bitset(('credit', role, value), lambda: self._credits.get(role, {}).get(value, ()))
+
+    def _date_bits(self, field: str, low: Optional[str], high: Optional[str]) -> int:
+        """Works released between two (possibly partial) dates or years, inclusive"""
+        if field == 'year' and not all(bound is None or bound.isdigit() for bound in (low, high)):
+            raise ValueError("Year ranges take whole years, like year:2020..2023")
+        lo, hi = self._date_slice(low, high)
+        return self._bitset(('dates', lo, hi), lambda: self._listing_docs[lo:hi])
+
+    def _bitset(self, key: tuple, docs: Callable[[], Iterable[int]]) -> int:
+        """Bitset of a set of works, cached under key until the index next changes"""
+        bits = self._bitsets.get(key)
+        if bits is None:
+            bits = self._bitsets[key] = to_bitset(docs())
+        return bits
+
+    def _parse(self, q: Optional[str], fuzzy: bool) -> Tuple[Optional[str], List[str], Set[str]]:
+        """
+        Cursor kind ('r' ranked, 'f' fuzzy, 'd' listing), BM25 terms and
+        trigrams of a query. The kind is None when q has text but nothing
+        indexable, so nothing can match.
+        """
+        if not q or not q.strip():
+            return 'd', [], set()
+        if fuzzy:
+            grams = trigrams(q)
+            return ('f' if grams else None), [], grams
+        terms = list(dict.fromkeys(tokenize(q)))
+        return ('r' if terms else None), terms, set()
+
+    def _listing(self, allowed: Optional[Set[int]], after: Optional[tuple]) -> Iterator[tuple]:
+        """Listing sort keys of the allowed works, starting just past the cursor"""
+        if allowed is not None:
+            return ((*self._doc_key[doc], doc) for doc in allowed)
+        start = bisect_right(self._listing_keys, after) if after is not None else 0
+        keys, docs = self._listing_keys, self._listing_docs
+        return ((*keys[i], docs[i]) for i in range(start, len(keys)))
+
+    def _score(
+        self,
+        terms: List[str],
+        allowed: Optional[Set[int]] = None,
+        every: bool = True
+    ) -> Dict[int, float]:
+        """
+        BM25 scores of the allowed works containing every term, or with
+        every=False, of all the allowed works by whichever terms they contain
+        """
+        postings = [self._postings.get(term) for term in terms]
+        if not every:
+            candidates = set(self._records) if allowed is None else set(allowed)
+            postings = [plist for plist in postings if plist]
+        elif not all(postings):
+            return {}
+        else:
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            if allowed is not None:
+                candidates.intersection_update(allowed)
+            for plist in postings[1:]:
+                candidates.intersection_update(plist)
+                if not candidates:
+                    return {}
+
+        total_docs = len(self._records)
+        avg_len = self._total_len / total_docs if total_docs else 0.0
+        scores: Dict[int, float] = dict.fromkeys(candidates, 0.0)
+        for plist in postings:
+            df = len(plist)
+            idf = math.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
+            for doc in candidates if every else candidates.intersection(plist):
+                tf = plist[doc]
+                norm = K1 * (1.0 - B + B * self._doc_len[doc] / avg_len) if avg_len else K1
+                scores[doc] += idf * tf * (K1 + 1.0) / (tf + norm)
+        return scores
+
+    def _fuzzy_score(self, grams: Set[str], allowed: Optional[Set[int]] = None) -> Dict[int, float]:
+        """
+        Trigram similarity of the allowed works sharing at least
+        FUZZY_THRESHOLD of the query's trigrams.
+
+        A work reaching the threshold must contain at least one of the
+        len(grams) - needed + 1 rarest query trigrams, so candidates come
+        from those short postings only and the common trigrams are merely
+        probed per candidate.
+        """
+        postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        needed = max(1, math.ceil(FUZZY_THRESHOLD * len(postings)))
+        candidates: Set[int] = set()
+        for docs in postings[:len(postings) - needed + 1]:
+            candidates.update(docs)
+        if allowed is not None:
+            candidates.intersection_update(allowed)
+
+        scores: Dict[int, float] = {}
+        for doc in candidates:
+            shared = sum(1 for docs in postings if doc in docs)
+            if shared >= needed:
+                # Mostly how much of the query was found, plus a small
+                # bonus for titles with little else in them
+                scores[doc] = 0.9 * shared / len(postings) + 0.1 * shared / len(self._doc_grams[doc])
+        return scores
+
+
+search_index = SearchIndex(catalog)
+
+metrics.gauge("archive_works_indexed", "Works in the full-text search index", lambda: len(search_index))
@@ -0,0 +1,339 @@
+"""
+"More like this" recommendations from TF-IDF embeddings.
+
+An offline build (database/build_similarity.py) turns every work into a
+sparse TF-IDF vector over its metadata (titles, genres, themes, emotional
+tags, credits, description), lyrics in every language version and
+analysis.md prose, using the search tokenizer so Japanese gets CJK
+bigrams. Genres, themes, tags and credited names are also entered whole,
+so "fragile hope" as a theme is one feature and not just two words.
+
+The vectors are reduced with a randomized truncated SVD computed in NumPy
+(no scipy: the sparse matrix is multiplied a densified block of rows at a
+time), and the rows of U * S are L2-normalized and saved as a float32
+matrix. Serving a work's neighbours is one matrix-vector product against
+that matrix. The file is replaced atomically and reloaded when its mtime
+changes; a file that cannot be read counts as no matrix at all.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import zipfile
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is only needed for recommendations
+    np = None
+
+from services.catalog import Catalog, WorkRecord, catalog
+from services.lyrics_index import language_versions
+from services.profiling import phase
+from services.search_index import normalize, tokenize
+
+SIMILARITY_PATH = Path(os.getenv(
+    "SIMILARITY_INDEX_PATH", os.path.join(tempfile.gettempdir(), "lob-similar.npz")
+))
+
+# Embedding dimensions kept from the SVD
+DIMENSIONS = 128
+
+# Terms must occur in at least this many works; rarer ones cannot link two works
+MIN_DF = 2
+
+# Extra columns sampled and power iterations run by the randomized SVD
+OVERSAMPLE = 10
+POWER_ITERATIONS = 4
+
+# Most terms kept, those found in the most works; bounds the SVD's cost
+MAX_TERMS = 20000
+
+# Values per densified block of rows when multiplying the sparse matrix
+BLOCK_CELLS = 1 << 22
+
+logger = logging.getLogger(__name__)
+
+# Weights of whole-value features and of text fields, as term frequencies
+LABEL_WEIGHT = 3.0
+TITLE_WEIGHT = 2.0
+TEXT_WEIGHT = 1.0
+
+
+def _dict(metadata: dict, key: str) -> dict:
+    value = metadata.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _list(value) -> List[str]:
+    values = value if isinstance(value, list) else [value]
+    return [item.strip() for item in values if isinstance(item, str) and item.strip()]
+
+
+def work_features(record: WorkRecord) -> Counter:
+    """Weighted term frequencies of one work's metadata, lyrics and analysis"""
+    metadata = record.metadata
+    classification = _dict(metadata, 'classification')
+    related = _dict(metadata, 'related_works')
+    features: Counter = Counter()
+
+    labels = {
+        'genre': _list(classification.get('genre')),
+        'theme': _list(classification.get('themes')),
+        'mood': _list(classification.get('emotional_tags')),
+        'credit': [
+            name.strip()
+            for value in _dict(metadata, 'credits').values()
+            for item in _list(value)
+            for name in item.split(",") if name.strip()
+        ],
+    }
+    for kind, values in labels.items():
+        for value in values:
+            features[f"{kind}={normalize(value)}"] += LABEL_WEIGHT
+
+    texts = [
+        (TITLE_WEIGHT, metadata.get('title')),
+        (TITLE_WEIGHT, metadata.get('title_native')),
+        (TITLE_WEIGHT, metadata.get('title_romanized')),
+        (TEXT_WEIGHT, related.get('album')),
+        (TEXT_WEIGHT, record.song.description),
+        (TEXT_WEIGHT, " ".join(labels['theme'] + labels['mood'])),
+    ]
+    lyrics = record.read_file(record.lyrics_file)
+    if lyrics is not None:
+        texts.extend((TEXT_WEIGHT, text) for text in language_versions(lyrics).values())
+    texts.append((TEXT_WEIGHT, record.read_file("analysis.md")))
+
+    for weight, text in texts:
+        if isinstance(text, str) and text:
+            for token in tokenize(text):
+                features[token] += weight
+    return features
+
+
+class _SparseRows:
+    """
+    A CSR matrix held as NumPy arrays, with the two products the SVD needs.
+
+    Products densify a block of rows at a time and hand it to BLAS: at the
+    density of TF-IDF rows that is far faster than gathering per nonzero,
+    and a block never holds more than BLOCK_CELLS values.
+    """
+
+    def __init__(self, indptr, indices, data, shape: Tuple[int, int]):
+        self.indptr, self.indices, self.data, self.shape = indptr, indices, data, shape
+        self._rows = np.repeat(np.arange(shape[0]), np.diff(indptr))
+        self._block = max(1, BLOCK_CELLS // max(1, shape[1]))
+
+    def _blocks(self):
+        for start in range(0, self.shape[0], self._block):
+            stop = min(start + self._block, self.shape[0])
+            lo, hi = self.indptr[start], self.indptr[stop]
+            block = np.zeros((stop - start, self.shape[1]), dtype=np.float32)
+            block[self._rows[lo:hi] - start, self.indices[lo:hi]] = self.data[lo:hi]
+            yield start, stop, block
+
+    def dot(self, dense):
+        """self @ dense"""
+        result = np.empty((self.shape[0], dense.shape[1]), dtype=np.float32)
+        for start, stop, block in self._blocks():
+            result[start:stop] = block @ dense
+        return result
+
+    def tdot(self, dense):
+        """self.T @ dense"""
+        result = np.zeros((self.shape[1], dense.shape[1]), dtype=np.float32)
+        for start, stop, block in self._blocks():
+            result += block.T @ dense[start:stop]
+        return result
+
+
+def tfidf(
+    features: List[Counter],
+    min_df: int = MIN_DF,
+    max_terms: int = MAX_TERMS
+) -> Tuple[_SparseRows, List[str]]:
+    """
+    L2-normalized TF-IDF rows (sublinear tf) over the max_terms terms found
+    in the most works, ignoring those in fewer than min_df
+    """
+    df = Counter(term for counts in features for term in counts)
+    common = [(-count, term) for term, count in df.items() if count >= min_df]
+    vocabulary = sorted(term for _, term in heapq.nsmallest(max_terms, common))
+    column = {term: index for index, term in enumerate(vocabulary)}
+    total = len(features)
+    idf = np.array([math.log((1 + total) / (1 + df[term])) + 1.0 for term in vocabulary], dtype=np.float32)
+
+    indptr = [0]
+    indices: List[int] = []
+    weights: List[float] = []
+    for counts in features:
+        row = sorted((column[term], 1.0 + math.log(tf)) for term, tf in counts.items() if term in column)
+        indices.extend(index for index, _ in row)
+        weights.extend(weight for _, weight in row)
+        indptr.append(len(indices))
+
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int64)
+    data = np.array(weights, dtype=np.float32) * idf[indices]
+    lengths = np.diff(indptr)
+    filled = np.flatnonzero(lengths)
+    if len(filled):
+        norms = np.sqrt(np.add.reduceat(data * data, indptr[filled]))
+        data /= np.repeat(norms, lengths[filled])
+    return _SparseRows(indptr, indices, data, (total, len(vocabulary))), vocabulary
+
+
+def truncated_svd(matrix: _SparseRows, dimensions: int, seed: int = 0):
+    """
+    U * S of a randomized rank-k SVD (Halko, Martinsson and Tropp): project
+    onto a random subspace, sharpen it with power iterations and take the
+    exact SVD of the small projected matrix.
+    """
+    rows, columns = matrix.shape
+    rank = max(1, min(dimensions, rows, columns))
+    sample = min(rank + OVERSAMPLE, rows, columns)
+    rng = np.random.default_rng(seed)
+
+    basis, _ = np.linalg.qr(matrix.dot(rng.standard_normal((columns, sample)).astype(np.float32)))
+    for _ in range(POWER_ITERATIONS):
+        projected, _ = np.linalg.qr(matrix.tdot(basis))
+        basis, _ = np.linalg.qr(matrix.dot(projected))
+
+    # basis.T @ matrix is small: sample x columns
+    small = matrix.tdot(basis).T
+    left, singular, _ = np.linalg.svd(small, full_matrices=False)
+    return (basis @ left[:, :rank]) * singular[:rank]
+
+
+def build_embeddings(records: Iterable[WorkRecord], dimensions: int = DIMENSIONS):
+    """
+    Work ids, their L2-normalized embedding matrix (float32, one row per
+    work) and the number of terms kept
+    """
+    if np is None:
+        raise RuntimeError("numpy is required to build the similarity index")
+    records = sorted(records, key=lambda record: record.id)
+    matrix, vocabulary = tfidf([work_features(record) for record in records])
+    if not records or not vocabulary:
+        return [record.id for record in records], np.zeros((len(records), 0), dtype=np.float32), 0
+
+    embeddings = truncated_svd(matrix, dimensions).astype(np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.where(norms > 0, norms, 1.0)
+    return [record.id for record in records], embeddings, len(vocabulary)
+
+
+def save_embeddings(path: Path, ids: List[str], embeddings) -> None:
+    """Write the matrix and ids, replacing any previous file atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    built_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(
+                f,
+                embeddings=embeddings,
+                ids=np.array(json.dumps(ids, ensure_ascii=False)),
+                built_at=np.array(built_at)
+            )
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class SimilarityIndex:
+    """Nearest neighbours over the saved embedding matrix, reloaded when the file changes"""
+
+    def __init__(self, source: Catalog, path: Path = SIMILARITY_PATH):
+        self.catalog = source
+        self.path = path
+        self.built_at: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._embeddings = None
+
+    @property
+    def available(self) -> bool:
+        self._load()
+        return self._embeddings is not None
+
+    @property
+    def version(self) -> str:
+        """Identifies the loaded matrix file, for cache keys and ETags"""
+        self._load()
+        return "" if self._stamp is None else "{}-{}".format(*self._stamp)
+
+    def _load(self) -> None:
+        if np is None:
+            return
+        try:
+            st = self.path.stat()
+        except OSError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            try:
+                with np.load(self.path) as saved:
+                    ids = json.loads(str(saved['ids']))
+                    embeddings = saved['embeddings']
+                    built_at = str(saved['built_at'])
+            except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                # Logged once per file version; unbuilt until the file is replaced
+                logger.warning("Ignoring unreadable similarity index %s: %s", self.path, e)
+                ids, embeddings, built_at = [], None, None
+            self._ids, self._embeddings, self.built_at = ids, embeddings, built_at
+            self._rows = {work_id: row for row, work_id in enumerate(ids)}
+            self._stamp = stamp
+
+    def similar(self, work_id: str, limit: int = 10) -> List[Tuple[WorkRecord, float]]:
+        """
+        Works most similar to work_id by cosine similarity, best first.
+
+        Empty if the work is not in the saved matrix (added since the last
+        build). Raises LookupError if no matrix has been built.
+        """
+        if not self.available:
+            raise LookupError("Similarity index has not been built")
+        ids, embeddings, rows = self._ids, self._embeddings, self._rows
+        row = rows.get(work_id)
+        if row is None or embeddings.shape[1] == 0:
+            return []
+
+        with phase("index"):
+            scores = embeddings @ embeddings[row]
+            scores[row] = -np.inf
+            # Fetch a few spare candidates for works removed since the build
+            count = min(limit + 8, len(ids) - 1)
+            if count <= 0:
+                return []
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top], kind='stable')]
+
+        results = []
+        for index in top:
+            creator_id, _, folder = ids[index].partition("/")
+            record = self.catalog.get(creator_id, folder)
+            if record is not None:
+                results.append((record, float(scores[index])))
+                if len(results) == limit:
+                    break
+        return results
+
+
+similarity_index = SimilarityIndex(catalog)
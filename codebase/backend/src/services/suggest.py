@@ -0,0 +1,308 @@
+"""
+Typeahead suggestions over titles, album names and credited names.
+
+Every distinct phrase (a work title, native or romanized title, album or
+credited name) is entered in a sorted array of normalized keys: once for
+the whole phrase and once for each later word start (and each CJK
+character, since Japanese has no spaces), so "inoue" completes
+"TAKU INOUE" and "すいせい" completes "星街すいせい". A completion is a bisect
+to the first key with the typed prefix followed by a walk over the matching
+range, picking the top k by whole-phrase match, field and popularity.
+
+Short prefixes match huge ranges, so the key array is kept as a list of
+small sorted chunks that each hold their best phrases pre-ranked. A lookup
+merges those lists for the chunks inside the range and scans only the two
+chunks at its ends, so it costs about one step per chunk rather than per
+matching key. When the catalog generation moves, keys of changed works are
+inserted or removed in their chunks and only those chunks are re-ranked.
+"""
+
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from services.catalog import Catalog, WorkRecord, catalog
+from services.profiling import phase
+from services.search_index import normalize
+
+# Ranking of phrase kinds; lower sorts first
+FIELD_RANKS = {"title": 0, "album": 1, "credit": 2}
+
+# Keys entered per phrase, bounding memory for long titles
+MAX_KEYS_PER_PHRASE = 24
+
+# Most completions one lookup returns
+MAX_COMPLETIONS = 20
+
+# Key entries per chunk with a precomputed top-k list (chunks split at twice this)
+BLOCK_SIZE = 32
+
+# Key changes in one sync above which the key array is re-sorted in one go
+REBUILD_THRESHOLD = 1024
+
+# (key, 0 for the whole phrase or 1 for a later word start, field, normalized phrase)
+KeyEntry = Tuple[str, int, str, str]
+
+# Word starts in normalized text: Latin words and every CJK character
+_START_RE = re.compile(
+    r"[0-9a-z\u00c0-\u024f]+"
+    r"|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff66-\uff9f]"
+)
+
+
+@dataclass
+class Suggestion:
+    """A distinct phrase and the works it appears in"""
+    text: str
+    field: str
+    works: Set[str] = field(default_factory=set)
+
+
+@dataclass(frozen=True)
+class Completion:
+    """A suggestion as returned to callers, with its work ids copied under the index lock"""
+    text: str
+    field: str
+    works: Tuple[str, ...]
+
+
+def _dict(metadata: dict, key: str) -> dict:
+    value = metadata.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def phrases(record: WorkRecord) -> List[Tuple[str, str]]:
+    """(field, text) pairs a work contributes to the suggestions"""
+    metadata = record.metadata
+    found = [
+        ("title", metadata.get(key))
+        for key in ('title', 'title_native', 'title_romanized')
+    ]
+    found.append(("album", _dict(metadata, 'related_works').get('album')))
+    for value in _dict(metadata, 'credits').values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str):
+                found.extend(("credit", name) for name in item.split(","))
+
+    result = []
+    for kind, text in found:
+        if isinstance(text, str) and text.strip():
+            result.append((kind, text.strip()))
+    return list(dict.fromkeys(result))
+
+
+def phrase_keys(text: str) -> List[str]:
+    """Normalized keys a phrase is reachable by: the whole phrase, then each word start"""
+    normalized = " ".join(normalize(text).split())
+    starts = [match.start() for match in _START_RE.finditer(normalized)]
+    keys = [normalized]
+    for start in starts[1:MAX_KEYS_PER_PHRASE]:
+        keys.append(normalized[start:])
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def _key_entries(text: str, ident: Tuple[str, str]) -> List[KeyEntry]:
+    return [(key, min(position, 1), *ident) for position, key in enumerate(phrase_keys(text))]
+
+
+class SuggestIndex:
+    """Sorted prefix keys over catalog phrases, kept in step with the catalog generation"""
+
+    def __init__(self, source: Catalog):
+        self.catalog = source
+        self.generation = -1
+        self._lock = threading.Lock()
+        self._suggestions: Dict[Tuple[str, str], Suggestion] = {}
+        self._doc_phrases: Dict[str, Tuple[WorkRecord, List[Tuple[str, str]]]] = {}
+        # Sorted key entries split into chunks of about BLOCK_SIZE, with each
+        # chunk's last entry and its best phrases as sorted (rank, ident)
+        # (None until recomputed after a change)
+        self._chunks: List[List[KeyEntry]] = []
+        self._maxes: List[KeyEntry] = []
+        self._tops: List[Optional[List[tuple]]] = []
+        self._ranks: Dict[Tuple[str, str], tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._suggestions)
+
+    def sync(self) -> None:
+        """Apply catalog changes since the last sync, touching only changed works"""
+        self.catalog.refresh()
+        if self.catalog.generation == self.generation:
+            return
+
+        with self._lock, phase("index"):
+            generation = self.catalog.generation
+            if generation == self.generation:
+                return
+
+            current = {record.id: record for record in self.catalog.works()}
+            added: List[KeyEntry] = []
+            removed: List[KeyEntry] = []
+            touched: Set[Tuple[str, str]] = set()
+            for work_id in list(self._doc_phrases):
+                if work_id not in current:
+                    self._remove(work_id, removed, touched)
+            for work_id, record in current.items():
+                indexed = self._doc_phrases.get(work_id)
+                if indexed is None or indexed[0] is not record:
+                    self._remove(work_id, removed, touched)
+                    self._add(record, added, touched)
+            self._apply(added, removed, touched)
+            self.generation = generation
+
+    def _add(self, record: WorkRecord, added: List[KeyEntry], touched: Set[Tuple[str, str]]) -> None:
+        entries = phrases(record)
+        for kind, text in entries:
+            ident = (kind, " ".join(normalize(text).split()))
+            suggestion = self._suggestions.get(ident)
+            if suggestion is None:
+                suggestion = self._suggestions[ident] = Suggestion(text=text, field=kind)
+                added.extend(_key_entries(text, ident))
+            suggestion.works.add(record.id)
+            touched.add(ident)
+        self._doc_phrases[record.id] = (record, entries)
+
+    def _remove(self, work_id: str, removed: List[KeyEntry], touched: Set[Tuple[str, str]]) -> None:
+        indexed = self._doc_phrases.pop(work_id, None)
+        if indexed is None:
+            return
+        for kind, text in indexed[1]:
+            ident = (kind, " ".join(normalize(text).split()))
+            suggestion = self._suggestions.get(ident)
+            if suggestion is None:
+                continue
+            suggestion.works.discard(work_id)
+            touched.add(ident)
+            if not suggestion.works:
+                del self._suggestions[ident]
+                removed.extend(_key_entries(text, ident))
+
+    def _apply(self, added: List[KeyEntry], removed: List[KeyEntry], touched: Set[Tuple[str, str]]) -> None:
+        """Merge key changes: in place for a few works, one re-sort for a bulk load"""
+        for ident in touched:
+            suggestion = self._suggestions.get(ident)
+            if suggestion is None:
+                self._ranks.pop(ident, None)
+            else:
+                # Popularity is part of the rank
+                self._ranks[ident] = (
+                    FIELD_RANKS[ident[0]], -len(suggestion.works), len(ident[1]), ident[1]
+                )
+
+        if len(added) + len(removed) > REBUILD_THRESHOLD:
+            dead = set(removed)
+            keys = [entry for chunk in self._chunks for entry in chunk if entry not in dead]
+            keys.extend(added)
+            keys.sort()
+            self._chunks = [keys[start:start + BLOCK_SIZE] for start in range(0, len(keys), BLOCK_SIZE)]
+            self._maxes = [chunk[-1] for chunk in self._chunks]
+            self._tops = [None] * len(self._chunks)
+        else:
+            for entry in removed:
+                self._discard(entry)
+            for entry in added:
+                self._insert(entry)
+            # Phrases whose work count changed rank differently in the
+            # chunks holding their keys
+            for ident in touched:
+                suggestion = self._suggestions.get(ident)
+                if suggestion is not None:
+                    for entry in _key_entries(suggestion.text, ident):
+                        index = bisect_left(self._maxes, entry)
+                        if index < len(self._tops):
+                            self._tops[index] = None
+
+        for index, top in enumerate(self._tops):
+            if top is None:
+                self._tops[index] = self._best(self._chunks[index])
+
+    def _discard(self, entry: KeyEntry) -> None:
+        index = bisect_left(self._maxes, entry)
+        if index == len(self._chunks):
+            return
+        chunk = self._chunks[index]
+        position = bisect_left(chunk, entry)
+        if position == len(chunk) or chunk[position] != entry:
+            return
+        del chunk[position]
+        if chunk:
+            self._maxes[index] = chunk[-1]
+            self._tops[index] = None
+        else:
+            del self._chunks[index], self._maxes[index], self._tops[index]
+
+    def _insert(self, entry: KeyEntry) -> None:
+        if not self._chunks:
+            self._chunks.append([entry])
+            self._maxes.append(entry)
+            self._tops.append(None)
+            return
+        index = min(bisect_left(self._maxes, entry), len(self._chunks) - 1)
+        chunk = self._chunks[index]
+        insort(chunk, entry)
+        self._maxes[index] = chunk[-1]
+        self._tops[index] = None
+        if len(chunk) > 2 * BLOCK_SIZE:
+            half = len(chunk) // 2
+            self._chunks[index:index + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[index:index + 1] = [chunk[half - 1], chunk[-1]]
+            self._tops[index:index + 1] = [None, None]
+
+    def _best(self, entries: List[KeyEntry]) -> List[tuple]:
+        """The MAX_COMPLETIONS best distinct phrases among key entries, as sorted (rank, ident)"""
+        best: Dict[Tuple[str, str], tuple] = {}
+        for _, partial, kind, text in entries:
+            ident = (kind, text)
+            rank = (partial, *self._ranks[ident])
+            if ident not in best or rank < best[ident]:
+                best[ident] = rank
+        return heapq.nsmallest(MAX_COMPLETIONS, ((rank, ident) for ident, rank in best.items()))
+
+    def suggest(self, q: str, limit: int = 10) -> List[Completion]:
+        """
+        Top completions of a typed prefix.
+
+        Phrases that start with the prefix rank above mid-phrase matches,
+        titles above albums and credits, and phrases shared by more works
+        above rarer ones.
+        """
+        self.sync()
+        prefix = " ".join(normalize(q).split())
+        limit = min(limit, MAX_COMPLETIONS)
+        if not prefix:
+            return []
+
+        low, high = (prefix,), (prefix + "\U0010ffff",)
+        with self._lock:
+            # Chunks wholly inside the prefix range contribute their
+            # precomputed top lists; only the chunks at either end are scanned
+            streams = []
+            first = bisect_left(self._maxes, low)
+            last = min(bisect_left(self._maxes, high), len(self._chunks) - 1)
+            for index in range(first, last + 1):
+                chunk = self._chunks[index]
+                if chunk[0] >= low and chunk[-1] < high:
+                    streams.append(self._tops[index])
+                else:
+                    start, stop = bisect_left(chunk, low), bisect_left(chunk, high)
+                    if start < stop:
+                        streams.append(self._best(chunk[start:stop]))
+
+            result = []
+            seen = set()
+            for _, ident in heapq.merge(*streams):
+                if ident not in seen:
+                    seen.add(ident)
+                    # A later sync mutates the Suggestion's set in place
+                    suggestion = self._suggestions[ident]
+                    result.append(Completion(suggestion.text, suggestion.field, tuple(sorted(suggestion.works))))
+                    if len(result) == limit:
+                        break
+            return result
+
+
+suggest_index = SuggestIndex(catalog)
@@ -0,0 +1,123 @@
+"""
+Thumbnail derivatives for list and grid views.
+
+The ingest scripts write thumbnails/thumbnail_<width>.<format> next to each
+work's original thumbnail. For works archived before that existed, the
+derivative is generated on first request and kept in THUMBNAIL_CACHE_DIR.
+Without Pillow the original image is served unchanged.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from services.catalog import WorkRecord
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+# Must match the layout written by scripts/archive_automation/thumbnail_processor.py;
+# tests/test_thumbnails.py compares the two
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+VARIANTS_DIR = "thumbnails"
+
+CACHE_DIR = Path(os.getenv(
+    "THUMBNAIL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lob-thumbnails")
+))
+
+ORIGINAL_MEDIA_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+def snap_width(width: int) -> int:
+    """Smallest prebuilt width that covers the requested one"""
+    for candidate in THUMBNAIL_WIDTHS:
+        if candidate >= width:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def variant_name(width: int, fmt: str) -> str:
+    return f"thumbnail_{width}.{fmt}"
+
+
+def source_thumbnail(record: WorkRecord) -> Optional[Path]:
+    """The work's original thumbnail, if it has one on disk"""
+    files = record.metadata.get('files')
+    files = files if isinstance(files, dict) else {}
+    for name in (files.get('thumbnail'), files.get('cover_art'), "thumbnail.jpg"):
+        if name:
+            path = record.path / Path(name).name
+            if path.is_file():
+                return path
+    return None
+
+
+def _fresh(path: Path, source_mtime: float) -> bool:
+    try:
+        return path.stat().st_mtime >= source_mtime
+    except OSError:
+        return False
+
+
+def _generate(source: Path, target: Path, width: int, fmt: str) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as original:
+        image = original.convert("RGB")
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+
+    # Write to a private temp file and rename so concurrent requests never
+    # serve a half-written image
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if fmt == "webp":
+                image.save(f, "WEBP", quality=80, method=4)
+            else:
+                image.save(f, "JPEG", quality=85, optimize=True, progressive=True)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def thumbnail_for(record: WorkRecord, width: int, fmt: str) -> Optional[Tuple[Path, str]]:
+    """
+    Path and media type of the best thumbnail for a width and format.
+
+    Prefers a prebuilt derivative, then a cached one, generating it if
+    needed. Falls back to the original when Pillow is unavailable or the
+    image can't be decoded. Returns None if the work has no thumbnail.
+    """
+    source = source_thumbnail(record)
+    if source is None:
+        return None
+    original = (source, ORIGINAL_MEDIA_TYPES.get(source.suffix.lower(), "application/octet-stream"))
+
+    width = snap_width(width)
+    name = variant_name(width, fmt)
+    media_type = THUMBNAIL_FORMATS[fmt]
+    source_mtime = source.stat().st_mtime
+
+    prebuilt = record.path / VARIANTS_DIR / name
+    if _fresh(prebuilt, source_mtime):
+        return prebuilt, media_type
+
+    cached = CACHE_DIR / hashlib.sha1(record.id.encode('utf-8')).hexdigest() / name
+    if _fresh(cached, source_mtime):
+        return cached, media_type
+
+    if Image is None:
+        return original
+    try:
+        _generate(source, cached, width, fmt)
+    except (OSError, ValueError):
+        return original
+    return cached, media_type
@@ -0,0 +1,137 @@
+"""
+Background warm-up of the archive catalog and indexes.
+
+The app starts serving as soon as it is up; the warm-up task then scans
+the archive and builds each index in a worker thread, recording how long
+every step took. /ready answers 503 until it has finished, so an
+orchestrator only routes traffic to warm instances, and the step timings
+measure cold-start cost.
+
+A required step that fails (an unmounted archive, say) is retried with
+exponential backoff, its error reported by /ready meanwhile, rather than
+keeping the instance unready for good. Optional steps, such as loading a
+similarity matrix that may not have been built, are logged and skipped.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import anyio.to_thread
+
+from services import metrics
+from services.catalog import catalog
+from services.lyrics_index import lyrics_index
+from services.search_index import search_index
+from services.similarity import similarity_index
+from services.suggest import suggest_index
+
+# (name, work, required) in the order they run; later steps read the
+# catalog the first one loads
+STEPS: List[Tuple[str, Callable[[], object], bool]] = [
+    ("catalog", lambda: catalog.refresh(force=True), True),
+    ("search", search_index.sync, True),
+    ("suggest", suggest_index.sync, True),
+    ("lyrics", lyrics_index.sync, True),
+    ("similarity", lambda: similarity_index.available, False),
+]
+
+# Seconds before retrying a failed required step, doubling up to RETRY_MAX
+RETRY_INITIAL = 1.0
+RETRY_MAX = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupState:
+    """Progress of the warm-up task"""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    seconds: Optional[float] = None
+    steps: Dict[str, float] = field(default_factory=dict)
+    # Optional steps that failed, with their errors
+    skipped: Dict[str, str] = field(default_factory=dict)
+    # Latest failure of the required step being retried
+    error: Optional[str] = None
+    retries: int = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and self.error is None
+
+
+state = WarmupState()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+async def _run_step(name: str, step: Callable[[], object], required: bool) -> None:
+    delay = RETRY_INITIAL
+    while True:
+        started = time.perf_counter()
+        try:
+            await anyio.to_thread.run_sync(step)
+        except Exception as e:
+            if not required:
+                logger.warning("Optional warm-up step %s skipped: %s", name, e)
+                state.skipped[name] = str(e)
+                return
+            logger.warning("Warm-up step %s failed, retrying in %gs: %s", name, delay, e)
+            state.error = f"{name}: {e}"
+            state.retries += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX)
+            continue
+        state.error = None
+        state.steps[name] = round(time.perf_counter() - started, 4)
+        return
+
+
+async def run() -> None:
+    """Run every warm-up step in a worker thread, recording step times"""
+    state.started_at = _now()
+    started = time.perf_counter()
+    for name, step, required in STEPS:
+        await _run_step(name, step, required)
+    state.seconds = round(time.perf_counter() - started, 4)
+    state.finished_at = _now()
+
+
+def readiness() -> dict:
+    """The /ready document: warm-up progress and the generation each index was built at"""
+    return {
+        "ready": state.ready,
+        "warmup": {
+            "startedAt": state.started_at,
+            "finishedAt": state.finished_at,
+            "seconds": state.seconds,
+            "steps": state.steps,
+            "skipped": state.skipped,
+            "error": state.error,
+            "retries": state.retries,
+        },
+        "catalog": {
+            "generation": catalog.generation,
+            "fingerprint": catalog.fingerprint,
+            "works": len(catalog),
+        },
+        "indexes": {
+            "search": {"generation": search_index.generation, "documents": len(search_index)},
+            "suggest": {"generation": suggest_index.generation, "phrases": len(suggest_index)},
+            "lyrics": {"generation": lyrics_index.generation, "lines": len(lyrics_index)},
+            "similarity": {"builtAt": similarity_index.built_at},
+        },
+    }
+
+
+metrics.gauge(
+    "app_warmup_seconds",
+    "Time the startup warm-up took (0 until it finishes)",
+    lambda: state.seconds or 0.0
+)
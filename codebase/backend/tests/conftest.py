@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Point the app at throwaway state before any project module is imported
+_tmpdir = tempfile.mkdtemp(prefix="lob-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'test.db')}")
+os.environ.setdefault("ARCHIVE_ROOT", os.path.join(_tmpdir, "archive"))
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+
+def _write_work(root: Path, creator: str, folder: str, lyrics=None, **metadata) -> Path:
+    work_dir = root / "creators" / creator / "Music" / "Singles" / folder
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (work_dir / "metadata.json").write_text(json.dumps(metadata, ensure_ascii=False), encoding="utf-8")
+    if lyrics is not None:
+        document = {"language_versions": lyrics}
+        (work_dir / "lyrics.json").write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+    return work_dir
+
+
+@pytest.fixture
+def add_work():
+    """add_work(root, creator, folder, lyrics={"en": ...}, **metadata) writes one work folder"""
+    return _write_work
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """An empty archive root"""
+    root = tmp_path / "archive"
+    (root / "creators").mkdir(parents=True)
+    return root
+
+
+@pytest.fixture
+def api_archive():
+    """The app's ARCHIVE_ROOT, emptied before and after the test; refresh the catalog after adding works"""
+    from services.cache import response_cache
+    from services.catalog import catalog
+
+    def reset():
+        shutil.rmtree(catalog.root, ignore_errors=True)
+        (catalog.root / "creators").mkdir(parents=True)
+        response_cache.local.clear()
+        catalog.refresh(force=True)
+
+    reset()
+    yield catalog.root
+    reset()
+
+
+@pytest.fixture
+def client():
+    """The API without its lifespan, so no warm-up task or watcher thread runs"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    return TestClient(app)
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from database import connection
+from database.models import User
+from services.auth import CurrentUser, UserCache, user_cache
+
+
+@pytest.fixture
+def cached_user():
+    """A users row with a cache entry for it, removed afterwards"""
+    connection.ensure_schema()
+    db = connection.SessionLocal()
+    try:
+        user = User(username="cached", email="cached@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        current = CurrentUser.from_row(user)
+    finally:
+        db.close()
+    user_cache.clear()
+    exp = int(time.time()) + 600
+    user_cache.set(current, exp, user_cache.epoch)
+    assert user_cache.get("cached", exp) == current
+    yield exp
+    db = connection.SessionLocal()
+    try:
+        db.execute(delete(User).where(User.username.in_(("cached", "renamed"))))
+        db.commit()
+    finally:
+        db.close()
+    user_cache.clear()
+
+
+@pytest.mark.parametrize("statement", [
+    lambda db: db.query(User).filter(User.username == "cached").update({"role": "admin"}),
+    lambda db: db.query(User).filter(User.username == "cached").delete(),
+    lambda db: db.execute(update(User).where(User.username == "cached").values(username="renamed")),
+    lambda db: db.execute(delete(User).where(User.username == "cached")),
+])
+def test_bulk_statements_drop_entries_once_committed(cached_user, statement):
+    db = connection.SessionLocal()
+    try:
+        statement(db)
+        # Not committed yet, so it may still roll back
+        assert user_cache.get("cached", cached_user) is not None
+        epoch = user_cache.epoch
+        db.commit()
+    finally:
+        db.close()
+    assert user_cache.get("cached", cached_user) is None
+    assert user_cache.epoch > epoch
+
+
+def test_rolled_back_bulk_statement_keeps_entries(cached_user):
+    db = connection.SessionLocal()
+    try:
+        db.execute(update(User).where(User.username == "cached").values(role="admin"))
+        db.rollback()
+        db.commit()
+    finally:
+        db.close()
+    assert user_cache.get("cached", cached_user) is not None
+
+
+def test_row_update_drops_entries_on_commit_not_flush(cached_user):
+    db = connection.SessionLocal()
+    try:
+        user = db.scalars(select(User).where(User.username == "cached")).one()
+        user.username = "renamed"
+        db.flush()
+        assert user_cache.get("cached", cached_user) is not None
+        db.commit()
+    finally:
+        db.close()
+    # Matched by id, so the entry under the old username goes too
+    assert user_cache.get("cached", cached_user) is None
+
+
+def test_rolled_back_row_update_keeps_entries(cached_user):
+    db = connection.SessionLocal()
+    try:
+        user = db.scalars(select(User).where(User.username == "cached")).one()
+        user.role = "admin"
+        db.flush()
+        db.rollback()
+        db.commit()
+    finally:
+        db.close()
+    assert user_cache.get("cached", cached_user) is not None
+
+
+def test_lookup_started_before_an_invalidation_is_not_cached(cached_user):
+    db = connection.SessionLocal()
+    try:
+        current = CurrentUser.from_row(db.scalars(select(User).where(User.username == "cached")).one())
+    finally:
+        db.close()
+    user_cache.clear()
+    epoch = user_cache.epoch
+    user_cache.invalidate(current.id)
+    user_cache.set(current, cached_user, epoch)
+    assert user_cache.get("cached", cached_user) is None
+    user_cache.set(current, cached_user, user_cache.epoch)
+    assert user_cache.get("cached", cached_user) == current
+
+
+def test_entries_expire_with_the_token():
+    cache = UserCache(ttl=60)
+    user = CurrentUser(id=1, username="short", email="s@example.com", role="user", is_active=True)
+    cache.set(user, int(time.time()) - 1, cache.epoch)
+    assert cache.get("short", int(time.time()) - 1) is None
@@ -0,0 +1,78 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from services.cache import LRUCache, ResponseCache
+from services.catalog import catalog
+
+
+@pytest.fixture
+def cached_app(api_archive):
+    """An app with one cached route, counting how often it is built"""
+    app = FastAPI()
+    cache = ResponseCache(redis_url=None)
+    builds = []
+
+    @app.get("/items")
+    def items(request: Request):
+        def build():
+            builds.append(dict(request.query_params))
+            return {"count": len(catalog)}, {"X-Built": str(len(builds))}
+        return cache.respond(request, build)
+
+    return TestClient(app), builds
+
+
+def test_etag_answers_304_until_the_catalog_changes(cached_app, api_archive, add_work):
+    client, builds = cached_app
+    response = client.get("/items")
+    etag = response.headers["etag"]
+    assert response.json() == {"count": 0}
+    assert response.headers["cache-control"] == "no-cache"
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        not_modified = client.get("/items", headers={"If-None-Match": header})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+    assert len(builds) == 1
+
+    add_work(api_archive, "Creator_A", "first", title="First")
+    catalog.refresh(force=True)
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json() == {"count": 1}
+
+
+def test_hits_reuse_body_and_headers(cached_app):
+    client, builds = cached_app
+    first = client.get("/items", params={"b": "2", "a": "1"})
+    # Parameter order and empty parameters do not change the key
+    second = client.get("/items", params={"a": "1", "b": "2", "c": ""})
+    assert second.content == first.content
+    assert second.headers["x-built"] == first.headers["x-built"] == "1"
+    assert second.headers["etag"] == first.headers["etag"]
+    assert len(builds) == 1
+
+    assert client.get("/items", params={"a": "3"}).headers["etag"] != first.headers["etag"]
+    assert len(builds) == 2
+
+
+def test_unreachable_redis_falls_back_to_the_local_cache():
+    pytest.importorskip("redis")
+    cache = ResponseCache(redis_url="redis://127.0.0.1:1/0")
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    assert cache.local.get("key") == b"value"
+
+
+def test_lru_evicts_oldest_and_expires():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", b"1", ttl=60)
+    lru.set("b", b"2", ttl=60)
+    assert lru.get("a") == b"1"
+    lru.set("c", b"3", ttl=60)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (b"1", None, b"3")
+
+    lru.set("d", b"4", ttl=-1)
+    assert lru.get("d") is None
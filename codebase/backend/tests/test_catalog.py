@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+from services import catalog as catalog_module
+from services.catalog import Catalog
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    """Work folders stat'ed by each scan"""
+    seen = []
+    stat_work = catalog_module._stat_work
+
+    def counting(work_dir, lyrics):
+        seen.append(work_dir.name)
+        return stat_work(work_dir, lyrics)
+
+    monkeypatch.setattr(catalog_module, "_stat_work", counting)
+    return seen
+
+
+def _catalog(archive):
+    # Reads never trigger a scan of their own here, only _watch_scan does
+    source = Catalog(archive, refresh_interval=3600)
+    source.refresh(force=True)
+    return source
+
+
+def _watch_scan(source, full=False):
+    # One pass of the watcher loop
+    with source._lock:
+        return source._publish(full)
+
+
+def test_watcher_rescans_only_creators_whose_directories_moved(archive, add_work, stats):
+    add_work(archive, "Creator_A", "first", title="First")
+    add_work(archive, "Creator_B", "second", title="Second")
+    source = _catalog(archive)
+    generation = source.generation
+
+    stats.clear()
+    assert not _watch_scan(source)
+    assert stats == []
+
+    add_work(archive, "Creator_B", "third", title="Third")
+    assert _watch_scan(source)
+    assert sorted(stats) == ["second", "third"]
+    assert source.get("Creator_B", "third").song.title == "Third"
+    assert source.generation == generation + 1
+
+    stats.clear()
+    add_work(archive, "Creator_C", "fourth", title="Fourth")
+    assert _watch_scan(source)
+    assert stats == ["fourth"]
+
+
+def test_in_place_edits_wait_for_the_full_scan(archive, add_work):
+    work_dir = add_work(archive, "Creator_A", "first", title="First")
+    source = _catalog(archive)
+
+    metadata = work_dir / "metadata.json"
+    metadata.write_text(json.dumps({"title": "Renamed"}), encoding="utf-8")
+    stat = metadata.stat()
+    os.utime(metadata, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert not _watch_scan(source)
+    assert source.get("Creator_A", "first").song.title == "First"
+    assert _watch_scan(source, full=True)
+    assert source.get("Creator_A", "first").song.title == "Renamed"
+
+
+def test_removed_creator_drops_out(archive, add_work):
+    add_work(archive, "Creator_A", "first", title="First")
+    work_dir = add_work(archive, "Creator_B", "second", title="Second")
+    source = _catalog(archive)
+
+    (work_dir / "metadata.json").unlink()
+    for path in (work_dir, work_dir.parent, work_dir.parent.parent, work_dir.parent.parent.parent):
+        path.rmdir()
+    assert _watch_scan(source)
+    assert [creator.id for creator in source.creators()] == ["Creator_A"]
+
+
+def test_separate_catalogs_agree_on_the_fingerprint(archive, add_work):
+    # Each worker builds its own catalog; shared Redis entries and ETags
+    # rely on them deriving the same fingerprint from the same archive
+    add_work(archive, "Creator_A", "first", title="First", lyrics={"en": "hello"})
+    add_work(archive, "Creator_B", "second", title="Second")
+    one, other = _catalog(archive), _catalog(archive)
+    assert one.fingerprint == other.fingerprint != ""
+
+    add_work(archive, "Creator_B", "third", title="Third")
+    one.refresh(force=True)
+    assert one.fingerprint != other.fingerprint
+    other.refresh(force=True)
+    assert one.fingerprint == other.fingerprint
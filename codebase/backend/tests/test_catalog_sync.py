@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, CatalogCreator, Credit, Work
+from services.catalog_sync import sync_catalog
+
+
+def _add_work(root, creator, folder, **metadata):
+    work_dir = root / "creators" / creator / "Music" / "Singles" / folder
+    work_dir.mkdir(parents=True)
+    (work_dir / "metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / "archive"
+    _add_work(root, "Creator_A", "first", title="First", credits={"composer": "A, B"})
+    _add_work(root, "Creator_A", "second", title="Second")
+    _add_work(root, "Creator_B", "third", title="Third")
+    return root
+
+
+def _count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_sync_upserts_then_skips_unchanged(db, archive):
+    stats = sync_catalog(db, archive, batch_size=2)
+    assert (stats.scanned, stats.upserted) == (3, 3)
+    assert _count(db, Work) == 3
+    assert _count(db, CatalogCreator) == 2
+    assert _count(db, Credit) == 2
+
+    stats = sync_catalog(db, archive)
+    assert (stats.unchanged, stats.upserted, stats.removed) == (3, 0, 0)
+
+
+def test_sync_removes_deleted_works(db, archive):
+    sync_catalog(db, archive)
+    for path in (archive / "creators" / "Creator_B").rglob("*"):
+        if path.is_file():
+            path.unlink()
+    (archive / "creators" / "Creator_B" / "Music" / "Singles" / "third").rmdir()
+
+    stats = sync_catalog(db, archive)
+    assert stats.removed == 1
+    assert _count(db, Work) == 2
+    assert db.scalars(select(CatalogCreator.id)).all() == ["Creator_A"]
+
+
+def test_sync_against_missing_root_keeps_rows(db, archive, tmp_path):
+    sync_catalog(db, archive)
+
+    with pytest.raises(OSError):
+        sync_catalog(db, tmp_path / "not-mounted")
+    assert _count(db, Work) == 3
+    assert _count(db, CatalogCreator) == 2
+
+
+def test_sync_against_empty_root_keeps_rows_unless_allowed(db, archive, tmp_path):
+    sync_catalog(db, archive)
+    empty = tmp_path / "empty"
+    (empty / "creators").mkdir(parents=True)
+
+    with pytest.raises(RuntimeError):
+        sync_catalog(db, empty)
+    assert _count(db, Work) == 3
+    assert _count(db, Credit) == 2
+
+    stats = sync_catalog(db, empty, allow_empty=True)
+    assert stats.removed == 3
+    assert _count(db, Work) == 0
+    assert _count(db, CatalogCreator) == 0
@@ -0,0 +1,61 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from services.catalog import catalog
+from services.export import CHUNK_BYTES, export_stream, parse_since
+
+DOCUMENTS = [
+    ("A/old", "A", {"title": "Old", "last_updated": "2021-01-01T00:00:00"}),
+    ("A/new", "A", {"title": "New", "last_updated": "2024-05-01T12:00:00"}),
+    ("B/archived", "B", {"title": "Archived", "archived_date": "2024-06-01"}),
+    ("B/undated", "B", {"title": "Undated ✓"}),
+]
+
+
+def _lines(body: bytes):
+    return [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+
+def test_since_keeps_recent_and_undated_works():
+    body = b"".join(export_stream(DOCUMENTS, since=parse_since("2024-01-01")))
+    assert [line["id"] for line in _lines(body)] == ["A/new", "B/archived", "B/undated"]
+    # An offset is converted to UTC before comparing
+    body = b"".join(export_stream(DOCUMENTS, since=parse_since("2024-05-01T14:00:00+02:00")))
+    assert [line["id"] for line in _lines(body)] == ["A/new", "B/archived", "B/undated"]
+    body = b"".join(export_stream(DOCUMENTS, since=parse_since("2024-05-01T12:00:01")))
+    assert [line["id"] for line in _lines(body)] == ["B/archived", "B/undated"]
+    assert parse_since("2024-01-01") == datetime(2024, 1, 1)
+    with pytest.raises(ValueError):
+        parse_since("yesterday")
+
+
+def test_gzip_stream_round_trips_in_chunks():
+    documents = [(f"A/{n:03d}", "A", {"title": f"Work {n}", "notes": "x" * 200}) for n in range(1000)]
+    plain = list(export_stream(documents))
+    assert len(plain) > 1
+    assert all(len(chunk) < 2 * CHUNK_BYTES for chunk in plain)
+    compressed = list(export_stream(documents, compress=True))
+    assert gzip.decompress(b"".join(compressed)) == b"".join(plain)
+    lines = _lines(b"".join(plain))
+    assert lines[0] == {"id": "A/000", "creatorId": "A", "metadata": documents[0][2]}
+    assert len(lines) == 1000
+
+
+def test_export_route(api_archive, add_work, client):
+    add_work(api_archive, "Creator_A", "old", title="Old", last_updated="2020-01-01T00:00:00")
+    add_work(api_archive, "Creator_B", "new", title="New", last_updated="2025-01-01T00:00:00")
+    catalog.refresh(force=True)
+
+    response = client.get("/api/export", params={"since": "2024-01-01"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert [line["id"] for line in _lines(response.content)] == ["Creator_B/new"]
+
+    response = client.get("/api/export", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert [line["id"] for line in _lines(response.content)] == ["Creator_A/old", "Creator_B/new"]
+    assert client.get("/api/export", params={"since": "soon"}).status_code == 400
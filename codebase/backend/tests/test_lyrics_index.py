@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from services.catalog import Catalog, catalog
+from services.lyrics_index import LyricsHit, LyricsIndex, highlight
+from services.search_index import SearchIndex
+
+
+def _rewrite_lyrics(work_dir, lyrics):
+    # Like lyrics_processor.save_lyrics: open('w') on the same file, metadata.json untouched
+    with open(work_dir / "lyrics.json", 'w', encoding='utf-8') as f:
+        json.dump({"language_versions": lyrics}, f, ensure_ascii=False)
+
+
+def _hits(index, q):
+    return [match.record.id for match in index.search(q).results]
+
+
+def test_in_place_lyrics_edit_is_reindexed(archive, add_work):
+    work_dir = add_work(archive, "Creator_A", "first", title="First", lyrics={"en": "hello world"})
+    source = Catalog(archive, refresh_interval=0)
+    index = LyricsIndex(source)
+    assert _hits(index, "hello") == ["Creator_A/first"]
+    generation, fingerprint = source.generation, source.fingerprint
+
+    _rewrite_lyrics(work_dir, {"en": "goodbye world"})
+
+    assert _hits(index, "goodbye") == ["Creator_A/first"]
+    assert _hits(index, "hello") == []
+    assert source.generation > generation
+    assert source.fingerprint != fingerprint
+
+
+def test_in_place_lyrics_edit_changes_the_etag(api_archive, add_work, client):
+    work_dir = add_work(api_archive, "Creator_A", "first", title="First", lyrics={"en": "hello world"})
+    catalog.refresh(force=True)
+    response = client.get("/api/search/lyrics", params={"q": "hello"})
+    assert response.json()["total"] == 1
+    etag = response.headers["etag"]
+
+    _rewrite_lyrics(work_dir, {"en": "goodbye world"})
+    catalog.refresh(force=True)
+
+    response = client.get("/api/search/lyrics", params={"q": "hello"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["total"] == 0
+    assert client.get("/api/search/lyrics", params={"q": "goodbye"}).json()["total"] == 1
+
+
+def test_lyrics_cursor_pages_by_matching_lines(archive, add_work):
+    add_work(archive, "Creator_A", "one", title="One", lyrics={"en": "star"})
+    add_work(archive, "Creator_A", "three", title="Three", lyrics={"en": "star\nstar\nstar"})
+    add_work(archive, "Creator_B", "two", title="Two", lyrics={"en": "star\nstar", "ja_romaji": "hoshi"})
+    index = LyricsIndex(Catalog(archive, refresh_interval=0))
+
+    ids, cursor = [], None
+    while True:
+        page = index.search("star", limit=2, cursor=cursor)
+        assert page.total == 3
+        ids.extend(match.record.id for match in page.results)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert ids == ["Creator_A/three", "Creator_B/two", "Creator_A/one"]
+
+    with pytest.raises(ValueError):
+        index.search("star", cursor=SearchIndex(Catalog(archive)).search(limit=1).next_cursor)
+
+
+def test_highlight_offsets_point_into_the_original_line():
+    # Full-width letters fold one to one
+    assert highlight("Ｓｔａｒ light, star!", ["star"]) == [(0, 4), (12, 16)]
+    # A character that expands (Ⅻ -> xii) shifts the offsets after it
+    assert highlight("Ⅻ star", ["star"]) == [(2, 6)]
+    assert highlight("Ⅻ", ["xii"]) == [(0, 1)]
+    # Half-width kana with a separate voiced mark compose into one character
+    assert highlight("ｶﾞｯ star", ["ガッ", "star"]) == [(0, 3), (4, 8)]
+    # Latin terms match whole words; CJK terms anywhere, overlaps merged
+    assert highlight("stars and star", ["star"]) == [(10, 14)]
+    assert highlight("彗星のように", ["彗星", "星の"]) == [(0, 3)]
+
+
+def test_snippet_escapes_around_the_marks():
+    hit = LyricsHit("en", 1, "<b> & star", highlight("<b> & star", ["star"]))
+    assert hit.snippet == "&lt;b&gt; &amp; <mark>star</mark>"
+
+
+def test_search_hits_highlight_half_width_kana(archive, add_work):
+    add_work(archive, "Creator_A", "first", title="First", lyrics={"ja": "ｶﾞｯﾂﾘ\nほかの行"})
+    index = LyricsIndex(Catalog(archive, refresh_interval=0))
+    (match,) = index.search("ガッツ").results
+    (hit,) = match.hits
+    assert (hit.line, hit.highlights) == (1, [(0, 4)])
@@ -0,0 +1,46 @@
+import pytest
+
+from services import metrics
+from services.metrics import Counter, Histogram, Registry, method_label
+
+
+def test_counter_and_histogram_exposition():
+    registry = Registry()
+    hits = registry.register(Counter("hits_total", "Hits", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+    hits.inc(route='/a"b')
+    hits.inc(2, route='/a"b')
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+
+    assert registry.render().splitlines() == [
+        "# HELP hits_total Hits",
+        "# TYPE hits_total counter",
+        'hits_total{route="/a\\"b"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 5.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+    with pytest.raises(ValueError):
+        registry.register(Counter("hits_total", "Again"))
+
+
+def test_non_standard_methods_share_one_label():
+    assert method_label({"method": "GET"}) == "GET"
+    assert method_label({"method": "PROPFIND"}) == "other"
+    assert method_label({"method": "get"}) == "other"
+
+
+def test_requests_are_labelled_by_route_template(client, api_archive):
+    client.get("/api/works/Creator_A/missing")
+    client.request("BREW", "/api/search")
+    body = client.get("/metrics").text
+    assert 'method="GET",route="/api/works/{creator_id}/{work_id}",status="404"' in body
+    assert 'method="other",route="/api/search"' in body
+    assert "Creator_A/missing" not in body
+    assert metrics.REQUEST_LATENCY.name in body
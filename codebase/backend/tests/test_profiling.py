@@ -0,0 +1,47 @@
+import threading
+import time
+
+from services.profiling import ProfileSession, StackSampler
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_work():
+    _spin(0.1)
+
+
+def _other_request():
+    _spin(0.1)
+
+
+def test_samples_only_come_from_the_sessions_own_phases():
+    profiled, other = ProfileSession(), ProfileSession()
+    started = threading.Event()
+
+    def run_other():
+        # Another request on another thread, inside its own phase
+        other.enter("index")
+        started.set()
+        _other_request()
+        other.exit()
+
+    thread = threading.Thread(target=run_other)
+    thread.start()
+    started.wait()
+    sampler = StackSampler(profiled, interval=0.001)
+    sampler.start()
+    # Outside any phase of the profiled request: not sampled
+    _spin(0.02)
+    profiled.enter("index")
+    _profiled_work()
+    profiled.exit()
+    samples = sampler.stop()
+    thread.join()
+
+    assert any("_profiled_work" in stack for stack in samples)
+    assert not any("_other_request" in stack for stack in samples)
+    assert set(profiled.summary()) == {"index"}
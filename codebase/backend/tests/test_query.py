@@ -0,0 +1,73 @@
+import pytest
+
+from services.query import (
+    MAX_DEPTH, And, Match, Not, Or, Range, Text, bitset_docs, parse_query, positive_text, to_bitset
+)
+
+
+def test_field_names_come_from_the_fixed_list():
+    assert parse_query("title:comet") == Match("title", "comet")
+    assert parse_query('Composer:"TAKU INOUE"') == Match("composer", "TAKU INOUE")
+    assert parse_query("video_direction:someone") == Match("video_direction", "someone")
+
+
+def test_unknown_field_names_are_plain_text():
+    assert parse_query("Re:Zero") == Text("Re:Zero")
+    assert parse_query("nosuchfield:value -type:cover") == And((Text("nosuchfield:value"), Not(Match("type", "cover"))))
+    assert parse_query('Re:"Zero"') == And((Text("Re:"), Text("Zero")))
+
+
+def test_ranges_stay_limited_to_range_fields():
+    with pytest.raises(ValueError):
+        parse_query("title:a..b")
+
+
+def test_and_binds_tighter_than_or():
+    a, b, c = Text("a"), Text("b"), Text("c")
+    assert parse_query("a b OR c") == Or((And((a, b)), c))
+    assert parse_query("a OR b AND c") == Or((a, And((b, c))))
+    assert parse_query("(a OR b) c") == And((Or((a, b)), c))
+    # Operators are capitals only
+    assert parse_query("a and b") == And((a, Text("and"), b))
+
+
+def test_not_applies_to_the_next_clause():
+    a, b, c = Text("a"), Text("b"), Text("c")
+    assert parse_query("NOT a b") == And((Not(a), b))
+    assert parse_query("-type:cover") == Not(Match("type", "cover"))
+    assert parse_query("a -(b OR c)") == And((a, Not(Or((b, c)))))
+    assert parse_query("NOT NOT a") == Not(Not(a))
+    # A lone "-" is text, and negated text does not rank
+    assert parse_query("a - b") == And((a, Text("-"), b))
+    assert positive_text(parse_query('a -b (c OR NOT d) "e f"')) == ["a", "c", "e f"]
+
+
+def test_ranges_may_be_open_at_either_end():
+    assert parse_query("year:2020..2023") == Range("year", "2020", "2023")
+    assert parse_query("year:..2021") == Range("year", None, "2021")
+    assert parse_query("date:2021-03..") == Range("date", "2021-03", None)
+    assert parse_query('date:"2021..2022"') == Match("date", "2021..2022")
+
+
+@pytest.mark.parametrize("query", [
+    "", "   ", "(a", "a)", "a OR", "NOT", "composer:(a)", 'title:"unterminated', "a AND OR b",
+])
+def test_malformed_queries_raise_value_error(query):
+    with pytest.raises(ValueError):
+        parse_query(query)
+
+
+def test_nesting_is_limited_to_max_depth():
+    deepest = "(" * MAX_DEPTH + "a" + ")" * MAX_DEPTH
+    assert parse_query(deepest) == Text("a")
+    with pytest.raises(ValueError):
+        parse_query("(" + deepest + ")")
+    assert parse_query("NOT " * MAX_DEPTH + "a") is not None
+    with pytest.raises(ValueError):
+        parse_query("-" * (MAX_DEPTH + 1) + "a")
+
+
+def test_bitsets_round_trip():
+    assert to_bitset([0, 3, 5]) == 0b101001
+    assert bitset_docs(to_bitset([0, 3, 5, 700])) == [0, 3, 5, 700]
+    assert (to_bitset([]), bitset_docs(0)) == (0, [])
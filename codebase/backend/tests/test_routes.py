@@ -0,0 +1,40 @@
+import pytest
+
+from services.catalog import catalog
+
+
+@pytest.fixture
+def works(api_archive, add_work):
+    add_work(api_archive, "Creator_A", "first", title="First", artist="Creator A",
+             release_date="2021-01-01", type="song", description="Long description")
+    add_work(api_archive, "Creator_A", "second", title="Second", artist="Creator A",
+             release_date="2022-01-01", type="cover")
+    catalog.refresh(force=True)
+
+
+def test_search_fields_trim_each_result(client, works):
+    results = client.get("/api/search", params={"fields": "id,title"}).json()["results"]
+    assert results == [
+        {"id": "Creator_A/first", "title": "First"},
+        {"id": "Creator_A/second", "title": "Second"},
+    ]
+
+    summary = client.get("/api/search", params={"view": "summary"}).json()["results"][0]
+    assert set(summary) == {"id", "creatorId", "title", "type", "release_date", "thumbnailUrl"}
+    full = client.get("/api/search").json()["results"][0]
+    assert full["description"] == "Long description"
+
+
+def test_creator_songs_fields_and_summary(client, works):
+    songs = client.get("/api/creator/Creator_A/songs", params={"fields": "title"}).json()
+    assert songs == [{"title": "First"}, {"title": "Second"}]
+    summary = client.get("/api/creator/Creator_A/songs", params={"view": "summary", "limit": 1}).json()
+    assert set(summary[0]) == {"title", "artist", "Release_date", "thumbnail"}
+
+
+def test_unknown_fields_and_views_are_rejected(client, works):
+    response = client.get("/api/search", params={"fields": "id,nope"})
+    assert response.status_code == 400
+    assert "nope" in response.json()["detail"]
+    assert client.get("/api/search", params={"view": "tiny"}).status_code == 422
+    assert client.get("/api/creator/Creator_A/songs", params={"fields": "secret"}).status_code == 400
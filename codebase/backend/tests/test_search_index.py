@@ -0,0 +1,192 @@
+import pytest
+
+from services.catalog import Catalog, catalog
+from services.search_index import SearchIndex, romanize_kana, tokenize, trigrams
+
+
+@pytest.fixture
+def index(archive, add_work):
+    add_work(
+        archive, "Creator_A", "comet",
+        title="Comet", title_native="彗星", release_date="2021-03-22", type="song",
+        description="A song about a comet crossing the night sky",
+        classification={"genre": ["J-Pop"], "themes": ["space"]},
+        credits={"composer": "TAKU INOUE", "lyricist": "Hoshimachi Suisei"}
+    )
+    add_work(
+        archive, "Creator_A", "michizure",
+        title="Michizure", title_native="みちづれ", release_date="2022-06-01", type="cover",
+        description="Acoustic cover recorded in one take",
+        classification={"genre": ["Rock"]},
+        credits={"composer": "Someone Else"}
+    )
+    add_work(
+        archive, "Creator_B", "stellar",
+        title="Stellar Stellar", release_date="2021-09-19", type="song",
+        description="Bright pop song, the comet is mentioned once",
+        classification={"genre": ["J-Pop", "Rock"]},
+        credits={"composer": "TAKU INOUE", "arranger": "TAKU INOUE"}
+    )
+    add_work(archive, "Creator_B", "demo", title="Untitled Demo", type="song")
+    return SearchIndex(Catalog(archive, refresh_interval=0))
+
+
+def _ids(page):
+    return [record.id for record in page.records]
+
+
+def test_title_clause_matches_title_fields_only(index):
+    assert _ids(index.search(query="title:comet")) == ["Creator_A/comet"]
+    assert _ids(index.search(query="title:彗星")) == ["Creator_A/comet"]
+    # "comet" is also in the stellar description, which title: ignores
+    assert sorted(_ids(index.search(query="comet"))) == ["Creator_A/comet", "Creator_B/stellar"]
+
+
+def test_role_clauses_do_not_depend_on_the_data(index):
+    assert sorted(_ids(index.search(query='composer:"TAKU INOUE"'))) == ["Creator_A/comet", "Creator_B/stellar"]
+    assert _ids(index.search(query='arranger:"taku inoue"')) == ["Creator_B/stellar"]
+    # A known role nobody is credited with yet is an empty result, not an error
+    page = index.search(query="mastering:anyone")
+    assert (page.records, page.total) == ([], 0)
+    assert _ids(index.search(query='credit:"Someone Else"')) == ["Creator_A/michizure"]
+
+
+def test_word_colon_text_is_searched_as_text(index):
+    assert index.search(query="Re:Zero").total == 0
+    assert _ids(index.search(query="Acoustic:cover")) == ["Creator_A/michizure"]
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    assert tokenize("彗星のうた") == ["彗星", "星の", "のう", "うた"]
+    # A lone character is kept, and unigrams=True adds every character
+    assert tokenize("星") == ["星"]
+    assert tokenize("彗星の", unigrams=True) == ["彗", "星", "の", "彗星", "星の"]
+    # Full- and half-width forms fold onto the same tokens
+    assert tokenize("ＣＯＭＥＴ Song ｶﾀｶﾅ") == ["comet", "song", "カタ", "タカ", "カナ"]
+
+
+def test_bm25_ranks_title_matches_first(index):
+    # comet is the title of one work and appears once in another's description
+    page = index.search(q="comet")
+    assert _ids(page) == ["Creator_A/comet", "Creator_B/stellar"]
+    assert page.total == 2
+    assert _ids(index.search(q="ＣＯＭＥＴ")) == _ids(page)
+    # Every query token must match
+    assert index.search(q="comet acoustic").total == 0
+
+
+def test_cjk_queries_match_bigrams_and_single_characters(index):
+    assert _ids(index.search(q="彗星")) == ["Creator_A/comet"]
+    assert _ids(index.search(q="星")) == ["Creator_A/comet"]
+    assert _ids(index.search(q="ちづ")) == ["Creator_A/michizure"]
+    assert _ids(index.search(q="michizure")) == ["Creator_A/michizure"]
+
+
+def test_date_range_is_inclusive_and_skips_undated_works(index):
+    assert _ids(index.search(date_from="2021-09-19", date_to="2021-09-19")) == ["Creator_B/stellar"]
+    # A partial dateTo covers the whole year or month
+    assert _ids(index.search(date_to="2021")) == ["Creator_A/comet", "Creator_B/stellar"]
+    assert _ids(index.search(date_from="2022")) == ["Creator_A/michizure"]
+    assert "Creator_B/demo" in _ids(index.search())
+
+
+def test_genre_filter_intersects_with_dates_and_text(index):
+    assert _ids(index.search(genre="rock")) == ["Creator_B/stellar", "Creator_A/michizure"]
+    assert _ids(index.search(genre="Rock", date_from="2021-01-01", date_to="2021-12-31")) == ["Creator_B/stellar"]
+    assert _ids(index.search(genre="Rock", q="comet")) == ["Creator_B/stellar"]
+    page = index.search(genre="Nope")
+    assert (page.records, page.total) == ([], 0)
+
+
+def _pages(index, **kwargs):
+    """Every page of a search at limit=1, following next_cursor"""
+    pages, cursor = [], None
+    while True:
+        page = index.search(limit=1, cursor=cursor, **kwargs)
+        pages.extend(_ids(page))
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},  # listing, 'd' cursors
+    {"genre": "rock"},
+    {"q": "comet"},  # ranked, 'r' cursors
+    {"query": "composer:\"taku inoue\" OR type:cover"},
+    {"q": "stellar comet", "fuzzy": True},  # fuzzy, 'f' cursors
+])
+def test_cursors_walk_the_same_order_as_one_page(index, kwargs):
+    everything = _ids(index.search(**kwargs))
+    assert len(everything) > 1
+    assert _pages(index, **kwargs) == everything
+
+
+def test_cursor_must_come_from_the_same_kind_of_query(index):
+    listing = index.search(limit=1).next_cursor
+    ranked = index.search(q="comet", limit=1).next_cursor
+    with pytest.raises(ValueError):
+        index.search(q="comet", cursor=listing)
+    with pytest.raises(ValueError):
+        index.search(cursor=ranked)
+    with pytest.raises(ValueError):
+        index.search(q="comet", fuzzy=True, cursor=ranked)
+    with pytest.raises(ValueError):
+        index.search(cursor="not a cursor")
+
+
+def test_creator_songs_cursor(api_archive, add_work, client):
+    for day in ("03", "01", "02"):
+        add_work(api_archive, "Creator_A", f"work-{day}", title=f"Work {day}", release_date=f"2021-01-{day}")
+    catalog.refresh(force=True)
+
+    titles, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get("/api/creator/Creator_A/songs", params=params)
+        assert response.headers["x-total-count"] == "3"
+        titles.extend(song["title"] for song in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert titles == ["Work 01", "Work 02", "Work 03"]
+    assert client.get("/api/creator/Creator_A/songs", params={"limit": 2, "cursor": "bogus"}).status_code == 400
+
+
+def test_trigrams_are_padded_per_word():
+    assert trigrams("Star") == {"  s", " st", "sta", "tar", "ar "}
+    assert trigrams("a b") == {"  a", " a ", "  b", " b "}
+    assert romanize_kana("みちづれ") == "michizure"
+    assert romanize_kana("キャッチー") == "kyacchii"
+
+
+def test_fuzzy_search_tolerates_typos(index):
+    assert _ids(index.search(q="Comit", fuzzy=True)) == ["Creator_A/comet"]
+    assert _ids(index.search(q="stelar", fuzzy=True)) == ["Creator_B/stellar"]
+    assert _ids(index.search(q="unttled demo", fuzzy=True)) == ["Creator_B/demo"]
+    # Kana titles are matched through their romanization
+    assert _ids(index.search(q="michizre", fuzzy=True)) == ["Creator_A/michizure"]
+    assert index.search(q="xyzzy", fuzzy=True).total == 0
+
+
+def test_fuzzy_search_respects_filters(index):
+    assert _ids(index.search(q="stellar comet", fuzzy=True)) == ["Creator_B/stellar", "Creator_A/comet"]
+    assert _ids(index.search(q="stellar comet", fuzzy=True, genre="rock")) == ["Creator_B/stellar"]
+    assert _ids(index.search(q="stellar comet", fuzzy=True, query="-genre:rock")) == ["Creator_A/comet"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("year:2021..2021", ["Creator_A/comet", "Creator_B/stellar"]),
+    ("year:2022..", ["Creator_A/michizure"]),
+    ("date:..2021-06", ["Creator_A/comet"]),
+    ("NOT type:cover", ["Creator_A/comet", "Creator_B/stellar", "Creator_B/demo"]),
+    ("(genre:rock OR genre:j-pop) -type:cover", ["Creator_A/comet", "Creator_B/stellar"]),
+    ("NOT (comet OR michizure)", ["Creator_B/demo"]),
+])
+def test_boolean_queries_select_works(index, query, expected):
+    assert _ids(index.search(query=query)) == expected
+
+
+def test_malformed_query_is_a_400(client, api_archive):
+    assert client.get("/api/search", params={"query": "(" * 100 + "a"}).status_code == 400
+    assert client.get("/api/search", params={"query": "title:a..b"}).status_code == 400
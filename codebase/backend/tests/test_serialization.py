@@ -0,0 +1,41 @@
+import json
+from datetime import date
+from decimal import Decimal
+from pathlib import PurePosixPath
+
+from fastapi.encoders import jsonable_encoder
+
+from models import Song
+from services.serialization import FastJSONResponse, dump_json
+
+
+def _song(title):
+    return Song(
+        title=title, artist="Creator A", Release_date="2021-03-22", source="", description="",
+        archived_by="", archived_date="", audio="", thumbnail="", analysis=""
+    )
+
+
+def test_dump_json_matches_the_default_encoder():
+    song = _song("彗星")
+    content = {"songs": [song, song], "total": 2, "nested": {"ok": True, "none": None}}
+    assert json.loads(dump_json(content)) == jsonable_encoder(content)
+    # Compact UTF-8, not ASCII-escaped
+    assert "彗星".encode("utf-8") in dump_json(content)
+    assert b", " not in dump_json([1, 2])
+
+
+def test_dump_json_falls_back_for_unknown_types():
+    class Opaque:
+        def __init__(self):
+            self.value = 1
+
+    content = {"when": date(2021, 3, 22), "path": PurePosixPath("a/b"), "price": Decimal("1.5")}
+    assert json.loads(dump_json(content)) == {"when": "2021-03-22", "path": "a/b", "price": 1.5}
+    assert json.loads(dump_json({"opaque": Opaque()})) == {"opaque": {"value": 1}}
+
+
+def test_fast_json_response_renders_with_pydantic_core():
+    response = FastJSONResponse([_song("One")])
+    assert response.media_type == "application/json"
+    assert json.loads(response.body)[0]["title"] == "One"
@@ -0,0 +1,97 @@
+import logging
+import os
+
+import pytest
+
+from services.catalog import Catalog, catalog
+from services.similarity import SimilarityIndex, build_embeddings, save_embeddings, similarity_index
+
+np = pytest.importorskip("numpy")
+
+
+def test_unreadable_matrix_counts_as_unbuilt(tmp_path, archive, caplog):
+    path = tmp_path / "similarity.npz"
+    path.write_bytes(b"PK\x03\x04 truncated")
+    index = SimilarityIndex(Catalog(archive, refresh_interval=0), path)
+
+    with caplog.at_level(logging.WARNING, logger="services.similarity"):
+        assert not index.available
+        assert not index.available
+    assert len(caplog.records) == 1
+    with pytest.raises(LookupError):
+        index.similar("Creator_A/first")
+
+
+def test_unreadable_matrix_is_a_503(api_archive, add_work, client, tmp_path, monkeypatch):
+    add_work(api_archive, "Creator_A", "first", title="First")
+    catalog.refresh(force=True)
+    path = tmp_path / "similarity.npz"
+    path.write_bytes(b"not a zip file")
+    monkeypatch.setattr(similarity_index, "path", path)
+    monkeypatch.setattr(similarity_index, "_stamp", None)
+
+    response = client.get("/api/works/Creator_A/first/similar")
+    assert response.status_code == 503
+
+
+def _archive_works(root, add_work):
+    add_work(root, "Creator_A", "comet", title="Comet", classification={"genre": ["J-Pop"], "themes": ["space"]},
+             credits={"composer": "TAKU INOUE"}, description="A song about a comet crossing the night sky")
+    add_work(root, "Creator_A", "michizure", title="Michizure", classification={"genre": ["Rock"]},
+             credits={"composer": "Someone Else"}, description="Acoustic cover recorded live")
+    add_work(root, "Creator_B", "space", title="Night Sky Comet", classification={"genre": ["J-Pop"], "themes": ["space"]},
+             credits={"composer": "TAKU INOUE"}, description="A comet song about the night sky")
+    add_work(root, "Creator_B", "rock", title="Heavy Rock Anthem", classification={"genre": ["Rock"]},
+             credits={"composer": "Someone Else"}, description="Acoustic cover recorded live")
+
+
+def _built(source, path):
+    ids, embeddings, _ = build_embeddings(source.works())
+    save_embeddings(path, ids, embeddings)
+    return SimilarityIndex(source, path)
+
+
+def test_nearest_neighbours_share_labels_and_text(tmp_path, archive, add_work):
+    _archive_works(archive, add_work)
+    source = Catalog(archive, refresh_interval=0)
+    index = _built(source, tmp_path / "similarity.npz")
+    assert index.available and index.built_at
+
+    neighbours = index.similar("Creator_A/comet", limit=2)
+    assert [record.id for record, _ in neighbours] == ["Creator_B/space", "Creator_A/michizure"]
+    assert neighbours[0][1] > neighbours[1][1]
+    assert [record.id for record, _ in index.similar("Creator_B/rock", limit=1)] == ["Creator_A/michizure"]
+    # Works added since the build have no neighbours yet
+    add_work(archive, "Creator_C", "new", title="New")
+    assert index.similar("Creator_C/new") == []
+
+
+def test_rebuilt_matrix_is_reloaded(tmp_path, archive, add_work):
+    _archive_works(archive, add_work)
+    source = Catalog(archive, refresh_interval=0)
+    path = tmp_path / "similarity.npz"
+    index = _built(source, path)
+    version = index.version
+
+    add_work(archive, "Creator_C", "new", title="Night Sky Comet Again",
+             classification={"genre": ["J-Pop"], "themes": ["space"]}, credits={"composer": "TAKU INOUE"})
+    ids, embeddings, _ = build_embeddings(source.works())
+    save_embeddings(path, ids, embeddings)
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 10**9))
+    assert index.version != version
+    assert "Creator_C/new" in [record.id for record, _ in index.similar("Creator_B/space")]
+
+
+def test_similar_route(api_archive, add_work, client, tmp_path, monkeypatch):
+    _archive_works(api_archive, add_work)
+    catalog.refresh(force=True)
+    path = tmp_path / "similarity.npz"
+    ids, embeddings, _ = build_embeddings(catalog.works())
+    save_embeddings(path, ids, embeddings)
+    monkeypatch.setattr(similarity_index, "path", path)
+    monkeypatch.setattr(similarity_index, "_stamp", None)
+
+    body = client.get("/api/works/Creator_A/comet/similar", params={"limit": 1}).json()
+    assert [result["id"] for result in body["results"]] == ["Creator_B/space"]
+    assert body["builtAt"] == similarity_index.built_at
+    assert client.get("/api/works/Creator_A/missing/similar").status_code == 404
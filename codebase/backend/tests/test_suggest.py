@@ -0,0 +1,68 @@
+import pytest
+
+from services import suggest
+from services.catalog import Catalog
+from services.search_index import normalize
+from services.suggest import FIELD_RANKS, SuggestIndex, phrase_keys
+
+
+def test_completions_keep_the_works_they_were_returned_with(archive, add_work):
+    add_work(archive, "Creator_A", "comet", title="Comet", credits={"composer": "TAKU INOUE"})
+    index = SuggestIndex(Catalog(archive, refresh_interval=0))
+    (completion,) = index.suggest("taku")
+    assert completion.works == ("Creator_A/comet",)
+
+    # A sync adding works to the same phrase must not change a returned result
+    add_work(archive, "Creator_B", "stellar", title="Stellar", credits={"composer": "TAKU INOUE"})
+    (updated,) = index.suggest("taku")
+    assert updated.works == ("Creator_A/comet", "Creator_B/stellar")
+    assert completion.works == ("Creator_A/comet",)
+
+
+def _expected(index, q, limit=10):
+    """Brute-force ranking over every phrase, for comparison with the chunked lookup"""
+    prefix = " ".join(normalize(q).split())
+    ranked = []
+    for (kind, text), suggestion in index._suggestions.items():
+        partials = [min(position, 1) for position, key in enumerate(phrase_keys(suggestion.text))
+                    if key.startswith(prefix)]
+        if partials:
+            rank = (min(partials), FIELD_RANKS[kind], -len(suggestion.works), len(text), text)
+            ranked.append((rank, suggestion.text))
+    return [text for _, text in sorted(ranked)[:limit]]
+
+
+def _texts(index, q, limit=10):
+    return [completion.text for completion in index.suggest(q, limit)]
+
+
+@pytest.mark.parametrize("rebuild_threshold", [0, 10**6])
+def test_chunked_lookup_matches_a_full_scan(archive, add_work, monkeypatch, rebuild_threshold):
+    # Small chunks so every prefix spans several, with splits and removals
+    monkeypatch.setattr(suggest, "BLOCK_SIZE", 4)
+    monkeypatch.setattr(suggest, "REBUILD_THRESHOLD", rebuild_threshold)
+    for number in range(60):
+        add_work(
+            archive, f"Creator_{number % 3}", f"work-{number:02d}",
+            title=f"Star {number:02d} night", title_native=f"星{number % 7}の歌",
+            credits={"composer": f"Composer {number % 5}", "lyricist": "Star Writer"}
+        )
+    source = Catalog(archive, refresh_interval=0)
+    index = SuggestIndex(source)
+    prefixes = ["s", "st", "star", "star 1", "night", "comp", "composer 3", "星", "の", "歌", "x"]
+    assert len(index.suggest("star", limit=5)) == 5
+    assert len(index._chunks) > 20
+    for q in prefixes:
+        assert _texts(index, q) == _expected(index, q), q
+    assert _texts(index, "s", limit=50) == _expected(index, "s", limit=suggest.MAX_COMPLETIONS)
+
+    # Incremental changes: drop some works, rename others
+    for number in range(0, 60, 4):
+        work_dir = archive / "creators" / f"Creator_{number % 3}" / "Music" / "Singles" / f"work-{number:02d}"
+        (work_dir / "metadata.json").unlink()
+        work_dir.rmdir()
+    for number in range(1, 60, 8):
+        add_work(archive, f"Creator_{number % 3}", f"work-{number:02d}", title=f"Stardust {number}",
+                 credits={"composer": "Composer 3"})
+    for q in prefixes + ["stardust"]:
+        assert _texts(index, q) == _expected(index, q), q
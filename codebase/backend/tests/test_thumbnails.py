@@ -0,0 +1,42 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from services import thumbnails
+from services.catalog import Catalog
+
+# The ingest script is standalone and declares its own copy of the layout
+PROCESSOR_PATH = Path(__file__).resolve().parents[3] / "scripts" / "archive_automation" / "thumbnail_processor.py"
+
+
+@pytest.fixture(scope="module")
+def processor():
+    spec = importlib.util.spec_from_file_location("thumbnail_processor", PROCESSOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_processor_layout_matches_the_backend(processor):
+    assert processor.THUMBNAIL_WIDTHS == thumbnails.THUMBNAIL_WIDTHS
+    assert set(processor.THUMBNAIL_FORMATS) == set(thumbnails.THUMBNAIL_FORMATS)
+    assert processor.VARIANTS_DIR == thumbnails.VARIANTS_DIR
+    for width in thumbnails.THUMBNAIL_WIDTHS:
+        for fmt in thumbnails.THUMBNAIL_FORMATS:
+            assert processor.variant_name(width, fmt) == thumbnails.variant_name(width, fmt)
+
+
+def test_backend_serves_the_processor_derivatives(processor, archive, add_work):
+    Image = pytest.importorskip("PIL.Image")
+    work_dir = add_work(archive, "Creator_A", "first", title="First")
+    Image.new("RGB", (800, 450), "navy").save(work_dir / "thumbnail.jpg")
+    processor.generate_thumbnail_variants(str(work_dir / "thumbnail.jpg"))
+
+    source = Catalog(archive, refresh_interval=0)
+    record = source.get("Creator_A", "first")
+    for width in thumbnails.THUMBNAIL_WIDTHS:
+        for fmt, media_type in thumbnails.THUMBNAIL_FORMATS.items():
+            path, served_type = thumbnails.thumbnail_for(record, width, fmt)
+            assert path.parent == work_dir / thumbnails.VARIANTS_DIR
+            assert served_type == media_type
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from services import warmup
+
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    state = warmup.WarmupState()
+    monkeypatch.setattr(warmup, "state", state)
+    monkeypatch.setattr(warmup, "RETRY_INITIAL", 0.001)
+    return state
+
+
+def _flaky(failures):
+    calls = []
+
+    def step():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OSError("archive not mounted")
+    return step, calls
+
+
+def test_required_step_is_retried_until_it_succeeds(fresh_state, monkeypatch):
+    catalog_step, calls = _flaky(2)
+    monkeypatch.setattr(warmup, "STEPS", [("catalog", catalog_step, True), ("search", lambda: None, True)])
+
+    asyncio.run(warmup.run())
+
+    assert len(calls) == 3
+    assert fresh_state.retries == 2
+    assert fresh_state.error is None
+    assert set(fresh_state.steps) == {"catalog", "search"}
+    assert fresh_state.ready
+
+
+def test_optional_step_failure_is_skipped(fresh_state, monkeypatch):
+    similarity_step, calls = _flaky(1)
+    monkeypatch.setattr(warmup, "STEPS", [("similarity", similarity_step, False)])
+
+    asyncio.run(warmup.run())
+
+    assert len(calls) == 1
+    assert fresh_state.skipped == {"similarity": "archive not mounted"}
+    assert fresh_state.ready
+
+
+def test_ready_is_503_while_a_required_step_fails(fresh_state, monkeypatch, client):
+    step, _ = _flaky(10**6)
+    monkeypatch.setattr(warmup, "STEPS", [("catalog", step, True)])
+
+    async def warm_briefly():
+        task = asyncio.create_task(warmup.run())
+        while fresh_state.retries < 2:
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(warm_briefly())
+    response = client.get("/ready")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["ready"] is False
+    assert body["warmup"]["error"] == "catalog: archive not mounted"
+    assert body["warmup"]["finishedAt"] is None
+
+    fresh_state.error = None
+    fresh_state.finished_at = "2026-01-01T00:00:00+00:00"
+    assert client.get("/ready").status_code == 200
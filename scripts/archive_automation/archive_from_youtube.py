@@ -15,6 +15,7 @@ from datetime import datetime
 from meta_data_generator import generate_metadata, save_metadata_json, validate_metadata
 from analysis_generator import generate_ai_analysis, save_analysis
 from lyrics_processor import extract_lyrics, save_lyrics, validate_lyrics
+from thumbnail_processor import generate_thumbnail_variants
 
 
 def safe_folder_name(name: str) -> str:
@@ -481,6 +482,14 @@ def archive_from_youtube(url: str, creator_name: str, interactive: bool = True):
         metadata['preservation']['completeness']['has_cover_art'] = True
         print(f"✓ Moved thumbnail to: {song_folder.name}/thumbnail.jpg")
 
+        # Small WebP/JPEG derivatives for list and grid views
+        try:
+            variants = generate_thumbnail_variants(str(thumbnail_dest))
+            if variants:
+                print(f"✓ Generated {len(variants)} thumbnail derivatives")
+        except (OSError, ValueError) as e:
+            print(f"   ⚠️  Could not generate thumbnail derivatives: {e}")
+
     # === UPDATE METADATA with final paths ===
     metadata["files"]["audio"] = final_audio_path.name
     
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Thumbnail Processor for Library of Babylon
+Generates fixed-width WebP/JPEG derivatives of a work's thumbnail so list
+and grid views can download small images instead of the full-size original.
+
+Derivatives are written next to the original as
+    thumbnails/thumbnail_<width>.<format>
+which is the layout the backend looks for before generating on demand.
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Must match the layout the backend serves (codebase/backend/src/services/thumbnails.py);
+# codebase/backend/tests/test_thumbnails.py compares the two
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = ("webp", "jpg")
+
+VARIANTS_DIR = "thumbnails"
+
+
+def variant_name(width: int, fmt: str) -> str:
+    """File name of one derivative, e.g. thumbnail_320.webp"""
+    return f"thumbnail_{width}.{fmt}"
+
+
+def generate_thumbnail_variants(
+    source_path: str,
+    widths: tuple = THUMBNAIL_WIDTHS,
+    formats: tuple = THUMBNAIL_FORMATS,
+    force: bool = False
+) -> List[str]:
+    """
+    Generate resized derivatives of a thumbnail.
+
+    Args:
+        source_path: Path to the original thumbnail (e.g. thumbnail.jpg)
+        widths: Target widths in pixels; images are never upscaled
+        formats: Output formats ("webp", "jpg")
+        force: Regenerate derivatives that are already up to date
+
+    Returns:
+        List of derivative paths that were written
+    """
+    if Image is None:
+        print("   ⚠️  Pillow is not installed; skipping thumbnail derivatives")
+        return []
+
+    source = Path(source_path)
+    output_dir = source.parent / VARIANTS_DIR
+    output_dir.mkdir(exist_ok=True)
+    source_mtime = source.stat().st_mtime
+
+    written = []
+    with Image.open(source) as original:
+        original = original.convert("RGB")
+        for width in widths:
+            if original.width > width:
+                height = max(1, round(original.height * width / original.width))
+                resized = original.resize((width, height), Image.LANCZOS)
+            else:
+                resized = original
+
+            for fmt in formats:
+                target = output_dir / variant_name(width, fmt)
+                if not force and target.exists() and target.stat().st_mtime >= source_mtime:
+                    continue
+
+                tmp = target.with_suffix(target.suffix + ".tmp")
+                if fmt == "webp":
+                    resized.save(tmp, "WEBP", quality=80, method=4)
+                else:
+                    resized.save(tmp, "JPEG", quality=85, optimize=True, progressive=True)
+                os.replace(tmp, target)
+                written.append(str(target))
+
+    return written
+
+
+def process_archive(archive_root: str, force: bool = False) -> None:
+    """
+    Backfill derivatives for every work that has a thumbnail.jpg.
+
+    Args:
+        archive_root: Archive directory containing creators/
+        force: Regenerate derivatives that are already up to date
+    """
+    creators_dir = Path(archive_root) / "creators"
+    processed = 0
+    skipped = 0
+
+    for thumbnail in sorted(creators_dir.glob("*/Music/Singles/*/thumbnail.jpg")):
+        try:
+            written = generate_thumbnail_variants(str(thumbnail), force=force)
+        except (OSError, ValueError) as e:
+            print(f"✗ Failed: {thumbnail.parent.name} - {e}")
+            continue
+
+        if written:
+            print(f"✓ {thumbnail.parent.name}: {len(written)} derivatives")
+            processed += 1
+        else:
+            skipped += 1
+
+    print("\n=== Summary ===")
+    print(f"Processed: {processed}")
+    print(f"Up to date: {skipped}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python thumbnail_processor.py <archive_root> [--force]")
+        sys.exit(1)
+
+    process_archive(sys.argv[1], force="--force" in sys.argv)